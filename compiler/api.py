@@ -0,0 +1,64 @@
+from concurrent.futures import Executor
+from typing import NamedTuple
+from errors import CompileError, LineError
+from ir import IRModule, lower_program
+from lexer import Lexer, ParallelLexer, Token
+from parser import Parser
+from passes import optimize
+from plast import Program, parse_tree_to_ast
+from validation import FunctionSymbol, validate_ast
+from xref import XrefIndex
+
+class CompileOptions(NamedTuple):
+    lazy: bool = False
+    index: bool = False
+    lower: bool = True
+    optimize: bool = True
+    imports: tuple[FunctionSymbol, ...] = ()
+    # large sources are lexed in chunks on this pool, which the caller owns and may share
+    lex_pool: Executor | None = None
+    lex_workers: int | None = None
+
+class CompileResult(NamedTuple):
+    tokens: list[Token]
+    ast: Program | None
+    module: IRModule | None
+    index: XrefIndex | None
+    diagnostics: list[LineError]
+
+    @property
+    def ok(self) -> bool:
+        return len(self.diagnostics) == 0
+
+# library entry point for embedding the compiler.
+#  - never prints or exits; every problem is returned as a diagnostic
+#  - every call builds its own lexer, parser, symbol table and index and the compiler
+#    keeps no module-level mutable state, so calls may run concurrently on any thread
+def compile(source: str, name: str, options: CompileOptions = CompileOptions()) -> CompileResult:
+    if options.lex_pool is not None:
+        lexer = ParallelLexer(source, name, options.lex_pool, options.lex_workers)
+    else:
+        lexer = Lexer(source, name)
+
+    tokens = lexer.lex()
+
+    if lexer.errors:
+        return CompileResult(tokens, None, None, None, lexer.line_errors())
+
+    ast = module = None
+    index = XrefIndex() if options.index else None
+
+    try:
+        ast = parse_tree_to_ast(Parser(tokens, source, options.lazy).parse())
+        validate_ast(ast, index, options.imports)
+
+        if options.lower:
+            module = lower_program(ast)
+            if options.optimize:
+                optimize(module)
+    except CompileError as e:
+        return CompileResult(tokens, ast, module, index, [e.diagnostic(name)])
+    except RecursionError:
+        return CompileResult(tokens, ast, module, index, [LineError("Program is nested too deeply", name, "", None)])
+
+    return CompileResult(tokens, ast, module, index, [])
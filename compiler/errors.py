@@ -1,4 +1,4 @@
-from typing import NamedTuple
+from typing import NamedTuple, TextIO
 from sys import stdout
 from nodes import ParseTreeNode
 
@@ -16,10 +16,29 @@ class LineError(NamedTuple):
     file: str
     line: str
 
-    pos: Position
+    pos: Position | None
+
+# raised by every compiler stage instead of printing; callers decide how to report it
+class CompileError(Exception):
+    def __init__(self, message: str, error: LineError | None = None):
+        super().__init__(message)
+        self.message = message
+        self.error = error
+
+    @staticmethod
+    def at(message: str, token) -> 'CompileError':
+        return CompileError(message, LineError(message, token.source, construct_line(token), token.position))
+
+    def diagnostic(self, file: str) -> LineError:
+        return self.error or LineError(self.message, file, "", None)
+
+def write_single_err(err: LineError, out: TextIO = stdout):
+    write = out.write
+
+    if err.pos is None:
+        write(red + "error" + reset + ": " + err.message + "\n" + italics + "--  in " + err.file + reset + "\n")
+        return
 
-def write_single_err(err: LineError):
-    write = stdout.write
     write(red + "error" + reset + ": " + err.message + "\n")
     write(italics + "--  in " + err.file + reset + "(" + green + str(err.pos.start_row) + reset + ":" + green + str(err.pos.start_col) + reset + "-" + green + str(err.pos.start_row) + reset + ":" + green + str(err.pos.end_col) + reset + ")\n")
 
@@ -35,16 +54,10 @@ def write_single_err(err: LineError):
     write("\n")
 
 def get_whole_line(string: str, index: int):
-    start: int = index
-    end: int = index
-
-    while start > 0 and string[start] != "\n":
-        start -= 1
-    
-    while end < len(string) and string[end] != "\n":
-        end += 1
+    start: int = string.rfind("\n", 0, index) + 1
+    end: int = string.find("\n", index)
 
-    return string[start : end]
+    return string[start : end if end != -1 else len(string)]
 
 def construct_line(node):
     from lexer import Token
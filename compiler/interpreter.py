@@ -0,0 +1,309 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from math import inf
+from operator import add, sub, mul, floordiv
+from sys import stdout
+from typing import NamedTuple, TextIO
+from ir import IRModule, IRFunction, Const, BinOp, Call, Ret
+from profiler import Profiler
+
+# prepared instructions are (opcode, ...) tuples so the dispatch loop is a short chain of
+# integer comparisons without any method calls.
+#  - OP_TAILCALL replaces a Call whose result is immediately returned, together with that Ret
+#  - OP_SPAWN and OP_JOIN only appear in parallel mode: an expensive pure call is started
+#    on the worker pool, and its result is waited for right before it is first used, before
+#    a call with side effects, or before the function is left
+OP_CONST, OP_BINOP, OP_CALL, OP_TAILCALL, OP_RET, OP_SPAWN, OP_JOIN = range(7)
+
+BINARY_OPS = {
+    "+": add,
+    "-": sub,
+    "*": mul,
+    "/": floordiv
+}
+
+class PreparedFunction(NamedTuple):
+    function: IRFunction
+    code: list[tuple]
+
+@dataclass(slots=True)
+class Frame:
+    function: PreparedFunction
+    pc: int
+    values: dict[str, int | None]
+    # the caller's temporary receiving the return value
+    dest: str | None
+
+# executes IR modules.
+#  - PLANG calls never become Python calls: every activation is a Frame on an explicit,
+#    heap-allocated stack, so recursion depth is only limited by max_depth
+#  - tail calls reuse the current frame, so tail-recursive programs run in constant space
+#  - with parallel set, non-tail calls to pure functions whose estimated cost reaches
+#    cost_threshold run on a process pool while the caller carries on. results land in the
+#    same temporaries as in a sequential run, so the outcome does not depend on timing
+class Interpreter:
+    def __init__(self, module: IRModule, out: TextIO = stdout, max_depth: int | None = None, profiler: 'Profiler | None' = None,
+            parallel: bool = False, workers: int | None = None, cost_threshold: float = 10_000):
+        self.module = module
+        self.out = out
+        self.max_depth = max_depth
+        self.profiler = profiler
+        self.workers = workers
+        self.stack: list[Frame] = []
+        self.__pool: ProcessPoolExecutor | None = None
+
+        self.builtins = {
+            "print": self.__print
+        }
+
+        spawn = None
+        if parallel:
+            costs = estimate_costs(module)
+            spawn = { name for name, cost in costs.items() if module.functions[name].pure and cost >= cost_threshold }
+
+        effects = set(self.builtins) | { name for name, fn in module.functions.items() if not fn.pure }
+        self.prepared = { name: prepare_function(fn, spawn, effects) for name, fn in module.functions.items() }
+
+    # adds or replaces a single function, e.g. for a REPL session. it is always prepared
+    # for sequential execution
+    def define(self, fn: IRFunction) -> None:
+        self.module.functions[fn.name] = fn
+        self.prepared[fn.name] = prepare_function(fn)
+
+    def close(self) -> None:
+        if self.__pool is not None:
+            self.__pool.shutdown(cancel_futures=True)
+            self.__pool = None
+
+    def __enter__(self) -> 'Interpreter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def run(self, name: str = "main", args: tuple[int, ...] = ()) -> int | None:
+        if name not in self.prepared:
+            raise Exception(f"Could not find function '{name}'")
+
+        stack = self.stack
+        entry = self.prepared[name]
+        stack.append(Frame(entry, 0, dict(zip(entry.function.params, args)), None))
+        base = len(stack) - 1
+
+        profiler = self.profiler
+        if profiler is not None:
+            depth = len(profiler.names)
+            profiler.enter(name, entry.function.position)
+
+        try:
+            return self.__execute(base)
+        finally:
+            del stack[base:]
+            if profiler is not None:
+                profiler.unwind(depth)
+
+    def __execute(self, base: int) -> int | None:
+        prepared = self.prepared
+        builtins = self.builtins
+        max_depth = self.max_depth
+        profiler = self.profiler
+        stack = self.stack
+
+        while True:
+            frame = stack[-1]
+            code = frame.function.code
+            values = frame.values
+
+            while True:
+                instr = code[frame.pc]
+                frame.pc += 1
+                op = instr[0]
+
+                if op == OP_BINOP:
+                    _, dest, fn, left, right = instr
+                    try:
+                        values[dest] = fn(values[left], values[right])
+                    except ZeroDivisionError:
+                        raise Exception(f"Division by zero in fun {frame.function.function.name}")
+                    continue
+
+                elif op == OP_CONST:
+                    values[instr[1]] = instr[2]
+                    continue
+
+                elif op == OP_CALL:
+                    _, dest, callee, args = instr
+                    argv = [values[a] for a in args]
+
+                    if callee in builtins:
+                        if profiler is not None:
+                            profiler.enter(callee, None)
+                            values[dest] = builtins[callee](*argv)
+                            profiler.leave()
+                        else:
+                            values[dest] = builtins[callee](*argv)
+                        continue
+
+                    target = prepared[callee]
+                    stack.append(Frame(target, 0, dict(zip(target.function.params, argv)), dest))
+
+                    if profiler is not None:
+                        profiler.enter(callee, target.function.position)
+
+                    if max_depth is not None and len(stack) - base > max_depth:
+                        raise Exception(f"Call stack exceeded {max_depth} frames in fun {callee}")
+                    break
+
+                elif op == OP_TAILCALL:
+                    _, callee, args = instr
+                    argv = [values[a] for a in args]
+
+                    if callee not in builtins:
+                        target = prepared[callee]
+                        frame.function = target
+                        frame.pc = 0
+                        frame.values = dict(zip(target.function.params, argv))
+
+                        if profiler is not None:
+                            profiler.tail(callee, target.function.position)
+                        break
+
+                    if profiler is not None:
+                        profiler.enter(callee, None)
+                        result = builtins[callee](*argv)
+                        profiler.leave()
+                    else:
+                        result = builtins[callee](*argv)
+
+                elif op == OP_SPAWN:
+                    _, dest, callee, args = instr
+                    values[dest] = self.__get_pool().submit(_evaluate, callee, tuple(values[a] for a in args))
+                    continue
+
+                elif op == OP_JOIN:
+                    values[instr[1]] = values[instr[1]].result()
+                    continue
+
+                else:
+                    result = values[instr[1]] if instr[1] is not None else None
+
+                stack.pop()
+                if profiler is not None:
+                    profiler.leave()
+
+                if len(stack) == base:
+                    return result
+
+                stack[-1].values[frame.dest] = result
+                break
+
+    def __print(self, value: int) -> None:
+        self.out.write(str(value) + "\n")
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(self.workers, initializer=_start_worker, initargs=(self.module,))
+
+        return self.__pool
+
+# interpreter of a pool worker process. workers always run sequentially
+_worker: Interpreter | None = None
+
+def _start_worker(module: IRModule) -> None:
+    global _worker
+    _worker = Interpreter(module)
+
+def _evaluate(name: str, args: tuple[int, ...]) -> int | None:
+    return _worker.run(name, args)
+
+# static cost of a call in executed instructions, including everything it calls. anything
+# that can recurse is assumed to be unbounded
+def estimate_costs(module: IRModule) -> dict[str, float]:
+    costs: dict[str, float] = {}
+    visiting: set[str] = set()
+
+    def cost(name: str) -> float:
+        if name in costs:
+            return costs[name]
+        if name in visiting:
+            return inf
+        if name not in module.functions:
+            return 1
+
+        visiting.add(name)
+        total = 0
+        for instr in module.functions[name].body:
+            total += cost(instr.name) if type(instr) == Call else 1
+
+        visiting.discard(name)
+        costs[name] = total
+        return total
+
+    for name in module.functions:
+        cost(name)
+
+    return costs
+
+# spawn is the set of functions whose non-tail calls are started on the worker pool, and
+# effects the set of functions with side effects (builtins and impure functions)
+def prepare_function(fn: IRFunction, spawn: set[str] | None = None, effects: set[str] = frozenset()) -> PreparedFunction:
+    code = []
+    body = fn.body
+
+    for i, instr in enumerate(body):
+        t = type(instr)
+
+        if t == Const:
+            code.append((OP_CONST, instr.dest, instr.value))
+        elif t == BinOp:
+            code.append((OP_BINOP, instr.dest, BINARY_OPS[instr.op], instr.left, instr.right))
+        elif t == Call:
+            if i + 1 < len(body) and type(body[i + 1]) == Ret and body[i + 1].value == instr.dest:
+                code.append((OP_TAILCALL, instr.name, instr.args))
+            elif spawn and instr.name in spawn:
+                code.append((OP_SPAWN, instr.dest, instr.name, instr.args))
+            else:
+                code.append((OP_CALL, instr.dest, instr.name, instr.args))
+        elif t == Ret:
+            # already covered by the preceding tail call
+            if code and code[-1][0] == OP_TAILCALL:
+                continue
+
+            code.append((OP_RET, instr.value))
+
+    if spawn:
+        code = __insert_joins(code, effects)
+
+    return PreparedFunction(fn, code)
+
+def __insert_joins(code: list[tuple], effects: set[str]) -> list[tuple]:
+    pending: list[str] = []
+    out = []
+
+    for instr in code:
+        op = instr[0]
+
+        if op == OP_BINOP:
+            reads = instr[3:5]
+        elif op == OP_CALL or op == OP_SPAWN:
+            reads = instr[3]
+        elif op == OP_TAILCALL:
+            reads = instr[2]
+        elif op == OP_RET:
+            reads = (instr[1],)
+        else:
+            reads = ()
+
+        # joined in the order the calls were started. nothing may still be running when the
+        # function is left or a side effect happens, so a spawned call that raises or never
+        # returns stops the program before anything a sequential run would not have done
+        leaving = op == OP_RET or op == OP_TAILCALL or op == OP_CALL and instr[2] in effects
+        for dest in [d for d in pending if leaving or d in reads]:
+            out.append((OP_JOIN, dest))
+            pending.remove(dest)
+
+        out.append(instr)
+        if op == OP_SPAWN:
+            pending.append(instr[1])
+
+    return out
@@ -0,0 +1,132 @@
+from itertools import count
+from typing import NamedTuple
+from errors import Position
+from plast import Program, FunctionDecl, Expression, Statement, BinaryOperation, FunctionCall, \
+    IntegerLiteral, Identifier, Node, AstVisitor, is_pure
+from visitor import Visitor, visits
+
+# three-address IR
+#  - every instruction assigns at most one fresh temporary ("%0", "%1", ...), so each
+#    function body is a single straight-line SSA block
+#  - operands are temporaries or parameter names; PLANG identifiers can never start with "%"
+
+class Const(NamedTuple):
+    dest: str
+    value: int
+
+class BinOp(NamedTuple):
+    dest: str
+    op: str
+    left: str
+    right: str
+
+class Call(NamedTuple):
+    dest: str
+    name: str
+    args: tuple[str, ...]
+
+class Ret(NamedTuple):
+    value: str | None
+
+Instr = Const | BinOp | Call | Ret
+
+class IRFunction(NamedTuple):
+    name: str
+    params: list[str]
+    pure: bool
+    body: list[Instr]
+    position: Position | None = None
+
+class IRModule(NamedTuple):
+    functions: dict[str, IRFunction]
+
+    # calls to anything outside the module (builtins, other units) are assumed impure
+    def is_pure_call(self, name: str) -> bool:
+        fn = self.functions.get(name)
+        return fn is not None and fn.pure
+
+def lower_program(root: Program) -> IRModule:
+    return IRModule({ c.name.token.content: lower_function(c) for c in root.children })
+
+# lowers a validated function declaration
+def lower_function(decl: FunctionDecl) -> IRFunction:
+    lowering = FunctionLowering()
+    value = lowering.visit(decl.body)
+    lowering.body.append(Ret(value))
+
+    params = [p.name.token.content for p in decl.parameters.params]
+    return IRFunction(decl.name.token.content, params, is_pure(decl), lowering.body, decl.name.token.position)
+
+# appends the instructions for an expression to `body`, returning the operand holding its value
+class FunctionLowering(AstVisitor):
+    def __init__(self):
+        self.body: list[Instr] = []
+        self.temps = count()
+
+    def fresh(self) -> str:
+        return f"%{next(self.temps)}"
+
+    @visits(Statement)
+    def visit_statement(self, expr: Statement) -> None:
+        self.visit(expr.child)
+        return None
+
+    @visits(IntegerLiteral)
+    def visit_integer(self, expr: IntegerLiteral) -> str:
+        dest = self.fresh()
+        self.body.append(Const(dest, int(expr.value)))
+        return dest
+
+    @visits(Identifier)
+    def visit_identifier(self, expr: Identifier) -> str:
+        return expr.value
+
+    @visits(BinaryOperation)
+    def visit_binary_operation(self, expr: BinaryOperation) -> str:
+        left = self.visit(expr.left)
+        right = self.visit(expr.right)
+        dest = self.fresh()
+        self.body.append(BinOp(dest, expr.op, left, right))
+        return dest
+
+    @visits(FunctionCall)
+    def visit_function_call(self, expr: FunctionCall) -> str:
+        args = tuple(self.visit(a) for a in expr.arguments.args)
+        dest = self.fresh()
+        self.body.append(Call(dest, expr.name.token.content, args))
+        return dest
+
+    @visits(Expression)
+    def visit_expression(self, expr: Expression) -> str | None:
+        value = None
+        for c in expr.children:
+            value = self.visit(c)
+
+        return value
+
+    def generic_visit(self, expr: Node):
+        raise Exception(f"Cannot lower AST node of type {type(expr)}")
+
+def format_function(fn: IRFunction) -> str:
+    printer = InstrFormatter()
+    lines = [f"{'fun' if fn.pure else 'imp'} {fn.name}({', '.join(fn.params)})"]
+    lines.extend("  " + printer.visit(instr) for instr in fn.body)
+
+    return "\n".join(lines)
+
+class InstrFormatter(Visitor):
+    @visits(Const)
+    def visit_const(self, instr: Const) -> str:
+        return f"{instr.dest} = {instr.value}"
+
+    @visits(BinOp)
+    def visit_binop(self, instr: BinOp) -> str:
+        return f"{instr.dest} = {instr.left} {instr.op} {instr.right}"
+
+    @visits(Call)
+    def visit_call(self, instr: Call) -> str:
+        return f"{instr.dest} = call {instr.name}({', '.join(instr.args)})"
+
+    @visits(Ret)
+    def visit_ret(self, instr: Ret) -> str:
+        return f"ret {instr.value or ''}".rstrip()
@@ -1,7 +1,11 @@
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
 from dataclasses import dataclass
 from enum import Enum, auto, unique
+import gc
+from os import cpu_count
 from typing import Optional, NamedTuple
-from errors import LineError, Position, get_whole_line, write_single_err
+from errors import LineError, Position, get_whole_line
 from string import ascii_letters, digits
 
 @unique
@@ -78,9 +82,9 @@ class Lexer:
         while self.index < len(self.input):
             peeked = self.peek()
 
-            if str.isalpha(peeked):               # identifier
+            if peeked in ascii_letters:           # identifier
                 self.__lex_identifier()
-            elif str.isdigit(peeked):             # integer
+            elif peeked in digits:                # integer
                 self.__lex_integer()
             elif peeked == "\n" or peeked == " ": # whitespace
                 self.__lex_whitespace()
@@ -122,7 +126,7 @@ class Lexer:
 
         while self.index < len(self.input):
             peeked = self.peek(length)
-            if peeked is not None and peeked in ascii_letters or length > 0 and peeked in digits:
+            if peeked is not None and (peeked in ascii_letters or length > 0 and peeked in digits):
                 length += 1
             else:
                 break
@@ -178,7 +182,121 @@ class Lexer:
         self.last = token
         self.tokens.append(token)
 
+    # errors are collected and the offending character skipped, so one run reports all of them
     def push_err(self, err: LexError) -> None:
-        write_single_err(LineError(err.message, self.source, get_whole_line(self.input, err.position.index), err.position))
         self.errors.append(err)
-        exit(1)
\ No newline at end of file
+
+    def line_errors(self) -> list[LineError]:
+        return [LineError(e.message, self.source, get_whole_line(self.input, e.position.index), e.position) for e in self.errors]
+
+# parallel lexing
+#  - the input is split right before whitespace that follows a non-whitespace character,
+#    so no token (including whitespace runs) can span two chunks
+#  - each chunk is lexed by its own Lexer primed with the row and column the sequential
+#    lexer would have reached at that point, so only indices need fixing up afterwards
+#  - workers send tokens back as flat arrays (type values, contents, position ints) rather
+#    than Token objects: unpickling Tokens one by one costs more than lexing sequentially.
+#    the Tokens are rebuilt and linked here
+#  - a long-lived pool can be passed in, otherwise one is started for every call. cyclic GC
+#    is turned off in the processes of a pool started here: every token they build stays
+#    alive until the chunk is sent back, and the processes exit right after. it is never
+#    touched in the caller's process or in a pool that was passed in
+#  - errors from every chunk are collected in source order, like the sequential lexer does
+class ParallelLexer(Lexer):
+    def __init__(self, input: str, source: str, pool: Executor | None = None, workers: int | None = None,
+            min_chunk: int = 1 << 16):
+        super().__init__(input, source)
+        self.pool = pool
+        self.workers = workers
+        self.min_chunk = min_chunk
+
+    def lex(self) -> 'list[Token]':
+        input = self.input
+        workers = self.workers or cpu_count() or 1
+        splits = _chunk_boundaries(input, max(self.min_chunk, len(input) // workers))
+
+        if len(splits) <= 2:
+            return super().lex()
+
+        jobs = []
+        row, col, last = 1, 1, 0
+        for start, end in zip(splits, splits[1:]):
+            newlines = input.count("\n", last, start)
+            if newlines:
+                row += newlines
+                col = start - input.rindex("\n", last, start)
+            else:
+                col += start - last
+
+            last = start
+            jobs.append((input[start:end], start, row, col, end == len(input)))
+
+        if self.pool is not None:
+            chunks = list(self.pool.map(_lex_chunk, *zip(*jobs)))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=gc.disable) as pool:
+                chunks = list(pool.map(_lex_chunk, *zip(*jobs)))
+
+        types = list(TokenType)
+        source = self.source
+        tokens = self.tokens
+        prev: 'Token | None' = None
+
+        for kinds, contents, positions, errors in chunks:
+            self.errors.extend(errors)
+
+            fields = zip(kinds, contents, positions[0::5], positions[1::5], positions[2::5], positions[3::5], positions[4::5])
+            for kind, content, index, start_row, start_col, end_row, end_col in fields:
+                token = Token(types[kind], content, Position(index, start_row, start_col, end_row, end_col), source, prev)
+                if prev:
+                    prev.right = token
+
+                prev = token
+                tokens.append(token)
+
+        # the EOF token is never linked to its neighbours
+        tokens[-1].left = None
+        if len(tokens) > 1:
+            tokens[-2].right = None
+
+        return tokens
+
+def _chunk_boundaries(input: str, size: int) -> list[int]:
+    splits = [0]
+    index = size
+
+    while index < len(input):
+        while index < len(input) and not (input[index] in " \n" and input[index - 1] not in " \n"):
+            index += 1
+
+        if index >= len(input):
+            break
+
+        splits.append(index)
+        index += size
+
+    splits.append(len(input))
+    return splits
+
+# lexes one chunk in a worker. token types are sent as indices into TokenType, and the
+# positions as five ints per token
+def _lex_chunk(chunk: str, offset: int, row: int, col: int, last: bool) -> 'tuple[bytes, list[str | None], array, list[LexError]]':
+    lexer = Lexer(chunk, "")
+    lexer.row = row
+    lexer.col = col
+
+    tokens = lexer.lex()
+    if not last:
+        tokens.pop()
+
+    types = {t: i for i, t in enumerate(TokenType)}
+    kinds = bytes(types[t.type] for t in tokens)
+    contents = [t.content for t in tokens]
+
+    positions = array("l")
+    for t in tokens:
+        p = t.position
+        positions.extend((p.index + offset, p.start_row, p.start_col, p.end_row, p.end_col))
+
+    errors = [e._replace(position=e.position._replace(index=e.position.index + offset)) for e in lexer.errors]
+    return kinds, contents, positions, errors
@@ -1,13 +1,14 @@
 import traceback
-from errors import write_single_err, LineError, Position
-from lexer import Lexer, TokenType
+from errors import write_single_err
 from nodes import ParseTreeNode, ParseTreeNodeType
-from parser import Parser
-from plast import FunctionDecl, Program, Statement, parse_tree_to_ast, Node, BinaryOperation, Expression, IntegerLiteral, Identifier
-from validation import validate_ast
+from plast import FunctionDecl, FunctionCall, Program, Statement, Node, BinaryOperation, Expression, IntegerLiteral, Identifier, AstVisitor, is_pure
+from session import Session
+from visitor import visits
 from time import perf_counter_ns
 
 def main() -> None:
+    session = Session()
+
     while True:
         source = ""
         print("Enter an expression to parse:\n")
@@ -17,91 +18,106 @@ def main() -> None:
                 break
             else:
                 source += "\n" + inpt
-        
+
+        # only the new input is compiled, functions from earlier inputs are kept
         start = perf_counter_ns()
-        print("\nLexing...")
+        print("\nCompiling...")
         try:
-            l = Lexer(source, "input")
-            tokens = l.lex()
+            result = session.submit(source)
         except Exception as e:
-            print("FAILED!")
+            print("\nFAILED!\n")
             traceback.print_exception(e)
-            break
-        
+            continue
+
         end = perf_counter_ns()
 
+        if result.diagnostics:
+            print("\nFAILED!\n")
+            for err in result.diagnostics:
+                write_single_err(err)
+            continue
+
         print(f"DONE! {format_ns(end - start)}")
-        print(f"\nParsing... ")
 
-        start = perf_counter_ns()
+        if "main" not in result.defined:
+            continue
 
-        try:
-            parser = Parser(tokens, source)
-            p_root = parser.parse()
+        print("\nRunning... ")
 
-            ast_root = parse_tree_to_ast(p_root)
+        start = perf_counter_ns()
 
-            validate_ast(ast_root)
+        try:
+            result = session.run()
         except Exception as e:
             print("\nFAILED!\n")
             traceback.print_exception(e)
-            break
-        
+            continue
+
         end = perf_counter_ns()
 
-        print(f"DONE! {format_ns(end - start)}")
+        print(f"DONE! {format_ns(end - start)}" + (f" => {result}" if result is not None else ""))
 
 def print_root(root: ParseTreeNode | Node, indent: str, last: bool):
-    print(indent, end="")
-    print("\\-" if last else "|-", end="")
-    indent += "  " if last else "| "
+    TreePrinter().visit(root, indent, last)
 
-    if type(root) == ParseTreeNode:
-        name = root.type if not root.type == ParseTreeNodeType.Token else f"{root.token.type} {root.token.content}"
-        
-        print(name)
+class TreePrinter(AstVisitor):
+    def line(self, text: str, indent: str, last: bool) -> str:
+        print(indent, end="")
+        print("\\-" if last else "|-", end="")
+        print(text)
 
-        children = list(filter(lambda c: c.type != ParseTreeNodeType.Whitespace, root.children))
+        return indent + ("  " if last else "| ") + "  "
+
+    def children(self, children: list, indent: str):
         for i, c in enumerate(children):
-            print_root(c, indent + "  ", i == len(children) - 1)
-    else:
-        t = type(root)
+            self.visit(c, indent, i == len(children) - 1)
+
+    @visits(ParseTreeNode)
+    def visit_parse_tree(self, root: ParseTreeNode, indent: str, last: bool):
+        name = root.type if not root.type == ParseTreeNodeType.Token else f"{root.token.type} {root.token.content}"
+        indent = self.line(name, indent, last)
+
+        self.children(list(filter(lambda c: c.type != ParseTreeNodeType.Whitespace, root.children)), indent)
+
+    @visits(Program)
+    def visit_program(self, root: Program, indent: str, last: bool):
+        self.children(root.children, self.line("Program", indent, last))
 
-        if t == Program:
-            print("Program")
-            
-            for i, c in enumerate(root.children):
-                print_root(c, indent + "  ", i == len(root.children) - 1)
+    @visits(Statement)
+    def visit_statement(self, root: Statement, indent: str, last: bool):
+        self.visit(root.child, self.line("Statement", indent, last), True)
 
-        elif t == Statement:
-            print("Statement")
-            print_root(root.child, indent + "  ", True)
+    @visits(FunctionDecl)
+    def visit_function(self, root: FunctionDecl, indent: str, last: bool):
+        str1 = f"{'fun' if is_pure(root) else 'imp'} {root.name.token.content}"
+        str2 = "(" + ", ".join([f'{p.name.token.content}: {p.type.type.token.content}' for p in root.parameters.params]) + ")"
+        self.visit(root.body, self.line(str1 + str2, indent, last), True)
 
-        elif t == FunctionDecl:
-            str1 = f"{('fun' if not root.pure or root.pure.token.type == TokenType.Kw_Fun else 'imp')} {root.name.token.content}"
-            str2 = "(" + ", ".join([f'{p.name.value}: {p.type.value}' for p in root.parameters.params]) + ")"
-            print(str1 + str2)
-            print_root(root.body, indent + "  ", True)
+    @visits(Expression)
+    def visit_expression(self, root: Expression, indent: str, last: bool):
+        self.children(root.children, self.line("Expression", indent, last))
 
-        elif t == Expression:
-            print("Expression")
+    @visits(BinaryOperation)
+    def visit_binary_operation(self, root: BinaryOperation, indent: str, last: bool):
+        indent = self.line(f"BinaryOperation {root.op}", indent, last)
 
-            for i, c in enumerate(root.children):
-                print_root(c, indent + "  ", i == len(root.children) - 1)
+        self.visit(root.left, indent, False)
+        self.visit(root.right, indent, True)
 
-        elif t == BinaryOperation:
-            print(f"BinaryOperation {root.op}")
+    @visits(FunctionCall)
+    def visit_function_call(self, root: FunctionCall, indent: str, last: bool):
+        self.children(root.arguments.args, self.line(f"FunctionCall {root.name.token.content}", indent, last))
 
-            print_root(root.left, indent + "  ", False)
-            print_root(root.right, indent + "  ", True)
+    @visits(IntegerLiteral)
+    def visit_integer(self, root: IntegerLiteral, indent: str, last: bool):
+        self.line(f"Integer {root.value}", indent, last)
 
-        elif t == IntegerLiteral:
-            print(f"Integer {root.value}")
+    @visits(Identifier)
+    def visit_identifier(self, root: Identifier, indent: str, last: bool):
+        self.line(f"Identifier {root.value}", indent, last)
 
-        elif t == Identifier:
-            print(f"Identifier {root.value}")
-        else:
-            print("not implemented")
+    def generic_visit(self, root: Node, indent: str, last: bool):
+        self.line("not implemented", indent, last)
 
 def format_ns(time): 
     if time <= 1_000:
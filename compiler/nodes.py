@@ -15,11 +15,20 @@ class ParseTreeNodeType(Enum):
     Factor = auto(),
     Element = auto(),
     Token = auto(),
-    Whitespace = auto()
+    Whitespace = auto(),
+    LazyBlockExpression = auto()
+
+# tokens[start:end] of a block that has not been parsed yet
+class TokenSpan(NamedTuple):
+    tokens: 'list[Token]'
+    start: int
+    end: int
+    source: str
 
 class ParseTreeNode(NamedTuple):
     type: ParseTreeNodeType
     children: 'list[ParseTreeNode]'
     token: 'Token | None' = None
+    span: 'TokenSpan | None' = None
 
 
@@ -1,13 +1,16 @@
 from typing import NoReturn
-from errors import LineError, get_whole_line, write_single_err
+from errors import CompileError, LineError, get_whole_line
 from lexer import Token, TokenType
-from nodes import ParseTreeNode, ParseTreeNodeType
+from nodes import ParseTreeNode, ParseTreeNodeType, TokenSpan
 
 class Parser:
-    def __init__(self, tokens: list[Token], source: str):
+    # with lazy set, function bodies are only brace-matched and kept as a TokenSpan in a
+    # LazyBlockExpression node, to be parsed with parse_block when first needed
+    def __init__(self, tokens: list[Token], source: str, lazy: bool = False):
         self.tokens = tokens
         self.position = 0
         self.source = source
+        self.lazy = lazy
         self.whitespace_buffer = []
 
         self.cur_tok = None
@@ -28,6 +31,9 @@ class Parser:
     def parse(self):
         return self.__parse_program()
 
+    def parse_block(self):
+        return self.__parse_block_expr()
+
     def __parse_program(self):
         nodes = []
 
@@ -40,6 +46,7 @@ class Parser:
         return ParseTreeNode(ParseTreeNodeType.Program, nodes)
 
     def __parse_function(self):
+        self.__consume_whitespace()
         if self.__peek_type() == TokenType.Kw_Imp:
             return self.__parse_imp_func()
         else:
@@ -54,7 +61,7 @@ class Parser:
 
         self.__expect(TokenType.Colon, nodes)
         self.__expect(TokenType.Identifier, nodes)
-        nodes.append(self.__parse_block_expr())
+        nodes.append(self.__parse_body())
 
         return ParseTreeNode(ParseTreeNodeType.ImpureFunction, nodes)
     
@@ -67,10 +74,36 @@ class Parser:
 
         self.__expect(TokenType.Colon, nodes)
         self.__expect(TokenType.Identifier, nodes)
-        nodes.append(self.__parse_block_expr())
+        nodes.append(self.__parse_body())
 
         return ParseTreeNode(ParseTreeNodeType.PureFunction, nodes)
 
+    def __parse_body(self):
+        if not self.lazy:
+            return self.__parse_block_expr()
+
+        start = self.position - 2
+        self.__expect(TokenType.LeftBrace)
+
+        depth = 0
+        while True:
+            if self.__peek_type() == TokenType.EOF:
+                self.__expect(TokenType.RightBrace)
+
+            tok = self.__consume()
+            if tok.type == TokenType.LeftBrace:
+                depth += 1
+            elif tok.type == TokenType.RightBrace:
+                depth -= 1
+                if depth == 0:
+                    break
+
+        # the whitespace in front of the brace is part of the span
+        self.whitespace_buffer = []
+
+        span = TokenSpan(self.tokens, start, self.position - 2, self.source)
+        return ParseTreeNode(ParseTreeNodeType.LazyBlockExpression, [], None, span)
+
     def __parse_param_list(self):
         nodes = []
         
@@ -146,13 +179,15 @@ class Parser:
             self.__expect([TokenType.Integer, TokenType.Identifier])
 
     def __parse_function_call(self, identifier = None):
-        nodes = []
+        nodes = [identifier] if identifier is not None else []
 
         if identifier is None:
             self.__expect(TokenType.Identifier, nodes)
 
         nodes.append(self.__parse_arg_list())
 
+        return ParseTreeNode(ParseTreeNodeType.FunctionCall, nodes)
+
     def __parse_arg_list(self):
         nodes = []
 
@@ -180,10 +215,9 @@ class Parser:
 
         joined = self.__join([str(t) for t in tok_type])
         peeked = self.__peek()
-        write_single_err(LineError(f"Expected token of type {joined}, encountered token of type {peeked.type}",
-            peeked.source, get_whole_line(self.source, peeked.position.start_col), peeked.position))
-        
-        raise Exception(f"Expected token of type {joined}, but got token of type {self.__peek_type()}")
+        message = f"Expected token of type {joined}, encountered token of type {peeked.type}"
+
+        raise CompileError(message, LineError(message, peeked.source, get_whole_line(self.source, peeked.position.index), peeked.position))
 
     def __accept(self, tok_type: TokenType | list[TokenType], into: list[ParseTreeNode]) -> bool:
         if type(tok_type) == TokenType:
@@ -224,7 +258,7 @@ class Parser:
 
     def __consume(self):
         if self.cur_tok is None:
-            raise Exception("Cannot consume null token")
+            raise CompileError("Unexpected end of input")
         out_tok = self.cur_tok
         self.last_tok = out_tok
         self.cur_tok = self.next_tok
@@ -0,0 +1,291 @@
+from typing import Callable, NamedTuple
+from ir import IRModule, IRFunction, Instr, Const, BinOp, Call, Ret
+from visitor import Visitor, visits
+
+# an analysis may get the analyses it depends on from the manager, so they are shared
+# through its cache
+class Analysis(NamedTuple):
+    name: str
+    compute: Callable[[IRModule, 'AnalysisManager'], object]
+
+class Pass(NamedTuple):
+    name: str
+    run: Callable[[IRModule, 'AnalysisManager'], bool]
+    # names of the analyses that are still valid after the pass changed the module
+    preserves: frozenset[str] = frozenset()
+
+class AnalysisManager:
+    def __init__(self, module: IRModule):
+        self.module = module
+        self.cache: dict[str, object] = {}
+
+    def get(self, analysis: Analysis):
+        if analysis.name not in self.cache:
+            self.cache[analysis.name] = analysis.compute(self.module, self)
+
+        return self.cache[analysis.name]
+
+    def invalidate(self, preserved: frozenset[str] = frozenset()) -> None:
+        self.cache = { k: v for k, v in self.cache.items() if k in preserved }
+
+class PassManager:
+    def __init__(self, passes: list[Pass], max_iterations: int = 1):
+        self.passes = passes
+        self.max_iterations = max_iterations
+
+    # runs the passes in order, repeating the whole pipeline until nothing changes or
+    # max_iterations is reached. the module is modified in place and returned
+    def run(self, module: IRModule) -> IRModule:
+        analyses = AnalysisManager(module)
+
+        for _ in range(self.max_iterations):
+            changed = False
+
+            for p in self.passes:
+                if p.run(module, analyses):
+                    analyses.invalidate(p.preserves)
+                    changed = True
+
+            if not changed:
+                break
+
+        return module
+
+def optimize(module: IRModule) -> IRModule:
+    return default_pipeline().run(module)
+
+def default_pipeline() -> PassManager:
+    return PassManager([inline(), cse, dce, unreachable_functions()], max_iterations=4)
+
+# analyses
+
+def __call_graph(module: IRModule, analyses: AnalysisManager) -> dict[str, set[str]]:
+    return { name: { i.name for i in fn.body if type(i) == Call } for name, fn in module.functions.items() }
+
+call_graph = Analysis("call_graph", __call_graph)
+
+# functions that can reach themselves through calls inside the module
+def __recursive(module: IRModule, analyses: AnalysisManager) -> set[str]:
+    graph = analyses.get(call_graph)
+    out = set()
+
+    for name in graph:
+        stack = list(graph[name])
+        seen = set()
+
+        while stack:
+            callee = stack.pop()
+            if callee == name:
+                out.add(name)
+                break
+
+            if callee in seen or callee not in graph:
+                continue
+
+            seen.add(callee)
+            stack.extend(graph[callee])
+
+    return out
+
+recursive_functions = Analysis("recursive_functions", __recursive)
+
+# functions that might not return normally: they can recurse, divide by a value that is
+# not a known non-zero constant, or call a function that can
+def __trapping(module: IRModule, analyses: AnalysisManager) -> set[str]:
+    graph = analyses.get(call_graph)
+    out = analyses.get(recursive_functions) | { name for name, fn in module.functions.items() if __may_trap_locally(fn) }
+
+    changed = True
+    while changed:
+        changed = False
+        for name, callees in graph.items():
+            if name not in out and callees & out:
+                out.add(name)
+                changed = True
+
+    return out
+
+trapping_functions = Analysis("trapping_functions", __trapping)
+
+def __may_trap_locally(fn: IRFunction) -> bool:
+    constants = __constants(fn)
+    return any(type(i) == BinOp and i.op == "/" and not constants.get(i.right) for i in fn.body)
+
+def __constants(fn: IRFunction) -> dict[str, int]:
+    return { i.dest: i.value for i in fn.body if type(i) == Const }
+
+# passes
+
+# common subexpression elimination: identical constants and binary operations over the
+# same operands are computed once per function
+def __cse(module: IRModule, analyses: AnalysisManager) -> bool:
+    changed = False
+
+    for name, fn in module.functions.items():
+        seen: dict[tuple, str] = {}
+        rename: dict[str, str] = {}
+        body: list[Instr] = []
+
+        for instr in fn.body:
+            instr = __substitute(instr, rename)
+            t = type(instr)
+
+            if t == Const:
+                key = ("const", instr.value)
+            elif t == BinOp:
+                left, right = instr.left, instr.right
+                if instr.op in "+*" and right < left:
+                    left, right = right, left
+                key = (instr.op, left, right)
+            else:
+                body.append(instr)
+                continue
+
+            if key in seen:
+                rename[instr.dest] = seen[key]
+                changed = True
+            else:
+                seen[key] = instr.dest
+                body.append(instr)
+
+        module.functions[name] = fn._replace(body=body)
+
+    return changed
+
+cse = Pass("cse", __cse, frozenset({ call_graph.name, recursive_functions.name, trapping_functions.name }))
+
+# dead code elimination: drops instructions whose result is never used, including the
+# discarded results of statements. instructions are kept if they call an impure function
+# or might not return normally, so a division by zero or an endless recursion still happens
+def __dce(module: IRModule, analyses: AnalysisManager) -> bool:
+    trapping = analyses.get(trapping_functions)
+    changed = False
+
+    for name, fn in module.functions.items():
+        constants = __constants(fn)
+        live: set[str] = set()
+        body: list[Instr] = []
+
+        for instr in reversed(fn.body):
+            t = type(instr)
+
+            if t == Ret:
+                if instr.value is not None:
+                    live.add(instr.value)
+            elif instr.dest not in live and not __has_effect(instr, module, trapping, constants):
+                changed = True
+                continue
+            elif t == BinOp:
+                live.update((instr.left, instr.right))
+            elif t == Call:
+                live.update(instr.args)
+
+            body.append(instr)
+
+        body.reverse()
+        module.functions[name] = fn._replace(body=body)
+
+    return changed
+
+dce = Pass("dce", __dce)
+
+def __has_effect(instr: Instr, module: IRModule, trapping: set[str], constants: dict[str, int]) -> bool:
+    if type(instr) == Call:
+        return not module.is_pure_call(instr.name) or instr.name in trapping
+
+    return type(instr) == BinOp and instr.op == "/" and not constants.get(instr.right)
+
+# removes every function that cannot be reached from one of the entry points. modules
+# without any of the entry points (libraries) are left alone
+def unreachable_functions(entries: tuple[str, ...] = ("main",)) -> Pass:
+    def run(module: IRModule, analyses: AnalysisManager) -> bool:
+        graph = analyses.get(call_graph)
+        stack = [e for e in entries if e in module.functions]
+        reachable = set()
+
+        if not stack:
+            return False
+
+        while stack:
+            name = stack.pop()
+            if name in reachable or name not in graph:
+                continue
+
+            reachable.add(name)
+            stack.extend(graph[name])
+
+        dead = [name for name in module.functions if name not in reachable]
+        for name in dead:
+            del module.functions[name]
+
+        return len(dead) > 0
+
+    return Pass("unreachable_functions", run)
+
+# inlines calls to small, non-recursive pure functions that return a value
+def inline(max_size: int = 8) -> Pass:
+    def run(module: IRModule, analyses: AnalysisManager) -> bool:
+        recursive = analyses.get(recursive_functions)
+        changed = False
+
+        for name, fn in list(module.functions.items()):
+            next_temp = __next_temp(fn.body)
+            rename: dict[str, str] = {}
+            body: list[Instr] = []
+
+            for instr in fn.body:
+                instr = __substitute(instr, rename)
+                callee = module.functions.get(instr.name) if type(instr) == Call else None
+
+                if callee is None or not callee.pure or callee.name in recursive \
+                        or len(callee.body) > max_size or callee.body[-1].value is None:
+                    body.append(instr)
+                    continue
+
+                names = dict(zip(callee.params, instr.args))
+                for c_instr in callee.body:
+                    if type(c_instr) == Ret:
+                        rename[instr.dest] = names.get(c_instr.value, c_instr.value)
+                        break
+
+                    names[c_instr.dest] = f"%{next_temp}"
+                    next_temp += 1
+                    body.append(__substitute(c_instr, names))
+
+                changed = True
+
+            module.functions[name] = fn._replace(body=body)
+
+        return changed
+
+    return Pass("inline", run)
+
+def __substitute(instr: Instr, names: dict[str, str]) -> Instr:
+    return Renamer(names).visit(instr) if names else instr
+
+class Renamer(Visitor):
+    def __init__(self, names: dict[str, str]):
+        self.names = names
+
+    @visits(Const)
+    def visit_const(self, instr: Const) -> Const:
+        return instr._replace(dest=self.names.get(instr.dest, instr.dest))
+
+    @visits(BinOp)
+    def visit_binop(self, instr: BinOp) -> BinOp:
+        names = self.names
+        return instr._replace(dest=names.get(instr.dest, instr.dest),
+            left=names.get(instr.left, instr.left), right=names.get(instr.right, instr.right))
+
+    @visits(Call)
+    def visit_call(self, instr: Call) -> Call:
+        names = self.names
+        return instr._replace(dest=names.get(instr.dest, instr.dest), args=tuple(names.get(a, a) for a in instr.args))
+
+    @visits(Ret)
+    def visit_ret(self, instr: Ret) -> Ret:
+        return instr._replace(value=self.names.get(instr.value, instr.value))
+
+def __next_temp(body: list[Instr]) -> int:
+    temps = [int(i.dest[1:]) for i in body if type(i) != Ret]
+    return max(temps, default=-1) + 1
@@ -1,7 +1,10 @@
 from collections import namedtuple
+from operator import attrgetter
 from typing import NamedTuple, TypeAlias
 from lexer import TokenType, Token
-from nodes import ParseTreeNodeType, ParseTreeNode
+from nodes import ParseTreeNodeType, ParseTreeNode, TokenSpan
+from parser import Parser
+from visitor import Transformer, Visitor, visits
 
 class BinaryOperation(NamedTuple):
     left: 'Node'
@@ -27,7 +30,7 @@ class FunctionDecl(NamedTuple):
     name: 'AstToken'
     parameters: 'ParamList'
     type: 'TypeSpec'
-    body: 'Expression'
+    body: 'Expression | LazyExpression'
     
 class ParamList(NamedTuple):
     left_paren: 'AstToken'
@@ -64,26 +67,88 @@ class AstToken(NamedTuple):
     token: 'Token'
     whitespace: list['Token']
 
+# function body from a lazy parse. it is parsed and converted on first attribute access,
+# and then behaves like the Expression it stands for
+class LazyExpression:
+    def __init__(self, span: TokenSpan):
+        self.span = span
+        self.__expression: 'Expression | None' = None
+
+    @property
+    def parsed(self) -> bool:
+        return self.__expression is not None
+
+    def force(self) -> 'Expression':
+        if self.__expression is None:
+            span = self.span
+            tree = Parser(span.tokens[span.start : span.end], span.source).parse_block()
+            self.__expression = parse_tree_to_ast(tree)
+
+        return self.__expression
+
+    def __getattr__(self, name: str):
+        return getattr(self.force(), name)
+
+def is_pure(decl: FunctionDecl) -> bool:
+    return not decl.pure or decl.pure.token.type == TokenType.Kw_Fun
+
 Node = BinaryOperation | Expression | Program | Statement | FunctionDecl | ParamList | Param | TypeSpec | AstToken
 
-def parse_tree_to_ast(root: ParseTreeNode): 
-    if root.type == ParseTreeNodeType.Program:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
+# with a HashConsTable, structurally identical expressions share a single node
+def parse_tree_to_ast(root: ParseTreeNode, table: 'HashConsTable | None' = None):
+    return ParseTreeConverter(table).visit(root)
+
+# interning table for hash-consed ASTs.
+#  - keys only hold values and the ids of already interned children, never positions, so
+#    equal keys mean structurally identical subtrees
+#  - identifiers and calls are keyed by their enclosing function: the same name can mean a
+#    different parameter elsewhere, and whether a call is allowed depends on the caller's
+#    purity. literal-only subtrees are shared across functions
+#  - a shared node keeps the tokens of its first occurrence. the token of every occurrence
+#    (its literal, identifier, operator or call name) is kept in `tokens`
+class HashConsTable:
+    def __init__(self):
+        self.nodes: dict[tuple, Node] = {}
+        self.tokens: dict[int, list[Token]] = {}
+
+    def intern(self, key: tuple, node: Node, token: Token) -> Node:
+        node = self.nodes.setdefault(key, node)
+        self.tokens.setdefault(id(node), []).append(token)
+        return node
+
+    def occurrences(self, node: Node) -> list[Token]:
+        return self.tokens.get(id(node), [])
+
+class ParseTreeConverter(Visitor):
+    key = staticmethod(attrgetter("type"))
+
+    def __init__(self, table: HashConsTable | None = None):
+        self.table = table
+        self.scope: str | None = None
+
+    @visits(ParseTreeNodeType.Program)
+    def visit_program(self, root: ParseTreeNode):
+        nodes = [self.visit(c) for c in root.children]
         return Program(nodes[:-1], nodes[-1])
 
-    elif root.type == ParseTreeNodeType.BlockExpression:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
+    @visits(ParseTreeNodeType.BlockExpression)
+    def visit_block_expression(self, root: ParseTreeNode):
+        nodes = [self.visit(c) for c in root.children]
         return Expression(nodes[0], nodes[-1], nodes[1:-1], None)
 
-    elif root.type == ParseTreeNodeType.BlocklessExpression:
-        return parse_tree_to_ast(root.children[0])
+    @visits(ParseTreeNodeType.BlocklessExpression)
+    def visit_blockless_expression(self, root: ParseTreeNode):
+        return self.visit(root.children[0])
 
-    elif root.type == ParseTreeNodeType.Statement:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
+    @visits(ParseTreeNodeType.Statement)
+    def visit_statement(self, root: ParseTreeNode):
+        nodes = [self.visit(c) for c in root.children]
         return Statement(nodes[0], nodes[1])
 
-    elif root.type == ParseTreeNodeType.PureFunction or root.type == ParseTreeNodeType.ImpureFunction:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
+    @visits(ParseTreeNodeType.PureFunction, ParseTreeNodeType.ImpureFunction)
+    def visit_function(self, root: ParseTreeNode):
+        self.scope = next(c.token.content for c in root.children if c.token and c.token.type == TokenType.Identifier)
+        nodes = [self.visit(c) for c in root.children]
 
         f_pure = nodes.pop(0) if nodes[0].token.type in [TokenType.Kw_Fun, TokenType.Kw_Imp] else None
         name = nodes.pop(0)
@@ -95,8 +160,9 @@ def parse_tree_to_ast(root: ParseTreeNode):
 
         return FunctionDecl(f_pure, name, p_list, f_type, body)
 
-    elif root.type == ParseTreeNodeType.ParamList:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
+    @visits(ParseTreeNodeType.ParamList)
+    def visit_param_list(self, root: ParseTreeNode):
+        nodes = [self.visit(c) for c in root.children]
         lparen = nodes.pop(0)
         rparen = nodes.pop(-1)
 
@@ -111,49 +177,91 @@ def parse_tree_to_ast(root: ParseTreeNode):
 
         return ParamList(lparen, params, rparen)
 
-    elif root.type == ParseTreeNodeType.ArgumentList:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
+    @visits(ParseTreeNodeType.ArgumentList)
+    def visit_argument_list(self, root: ParseTreeNode):
+        nodes = [self.visit(c) for c in root.children]
         lparen = nodes.pop(0)
         rparen = nodes.pop(-1)
 
-        return ArgList(lparen, nodes, rparen)
+        return ArgList(lparen, nodes[::2], rparen)
 
-    elif root.type == ParseTreeNodeType.Token:
+    @visits(ParseTreeNodeType.Token)
+    def visit_token(self, root: ParseTreeNode):
         return AstToken(root.token, root.children)
 
-    elif root.type == ParseTreeNodeType.Term or root.type == ParseTreeNodeType.Factor:
+    @visits(ParseTreeNodeType.Term, ParseTreeNodeType.Factor)
+    def visit_term(self, root: ParseTreeNode):
         cdn = root.children
         
         if len(cdn) == 1:
-            return parse_tree_to_ast(cdn[0])
+            return self.visit(cdn[0])
         
-        nodes = list(map(lambda x: parse_tree_to_ast(x), cdn[::-2]))
+        # operands are converted in source order, so a shared node is interned at its first occurrence
+        nodes = [self.visit(c) for c in cdn[::2]][::-1]
         ops = list(reversed(cdn[1::2]))
 
         while len(nodes) > 1:
-            nodes.append(BinaryOperation(nodes.pop(), nodes.pop(), ops.pop().token.content))
+            op = ops.pop().token
+            node = BinaryOperation(nodes.pop(), nodes.pop(), op.content)
+
+            if self.table is not None:
+                node = self.table.intern(("bin", node.op, id(node.left), id(node.right)), node, op)
+
+            nodes.append(node)
 
         return nodes.pop()
 
-    elif root.type == ParseTreeNodeType.FunctionCall:
-        nodes = [parse_tree_to_ast(c) for c in root.children]
-        return FunctionCall(nodes[0], nodes[1])
+    @visits(ParseTreeNodeType.FunctionCall)
+    def visit_function_call(self, root: ParseTreeNode):
+        nodes = [self.visit(c) for c in root.children]
+        node = FunctionCall(nodes[0], nodes[1])
+
+        if self.table is not None:
+            key = ("call", self.scope, node.name.token.content) + tuple(id(a) for a in node.arguments.args)
+            node = self.table.intern(key, node, node.name.token)
 
-    elif root.type == ParseTreeNodeType.Element:
-        node = parse_tree_to_ast(root.children[0])
+        return node
+
+    @visits(ParseTreeNodeType.Element)
+    def visit_element(self, root: ParseTreeNode):
+        node = self.visit(root.children[0])
+
+        table = self.table
 
         if node.token.type == TokenType.Integer:
-            return IntegerLiteral(node.token.content, node)
+            literal = IntegerLiteral(node.token.content, node)
+            return table.intern(("int", literal.value), literal, node.token) if table is not None else literal
 
         elif node.token.type == TokenType.Identifier:
-            return Identifier(node.token.content, node)
+            ident = Identifier(node.token.content, node)
+            return table.intern(("id", self.scope, ident.value), ident, node.token) if table is not None else ident
 
         else:
             raise Exception("Unreachable code")
 
-    elif root.type == ParseTreeNodeType.Whitespace:
+    @visits(ParseTreeNodeType.LazyBlockExpression)
+    def visit_lazy_block_expression(self, root: ParseTreeNode):
+        return LazyExpression(root.span)
+
+    @visits(ParseTreeNodeType.Whitespace)
+    def visit_whitespace(self, root: ParseTreeNode):
         pass
 
-    else:
+    def generic_visit(self, root: ParseTreeNode):
         raise NotImplementedError(f"Not implemented for type {root.type}")
 
+# visitor over AST nodes that sees through lazily parsed bodies
+class AstVisitor(Visitor):
+    # a lazy body is visited as the Expression it stands for. when a transformer leaves that
+    # unchanged, the LazyExpression itself is returned so the enclosing nodes are not copied
+    @visits(LazyExpression)
+    def visit_lazy_expression(self, node: LazyExpression, *args):
+        expression = node.force()
+        new = self.visit(expression, *args)
+        return node if new is expression else new
+
+# transformer over AST nodes that treats tokens as leaves
+class AstTransformer(AstVisitor, Transformer):
+    @visits(AstToken)
+    def visit_token(self, node: AstToken, *args):
+        return node
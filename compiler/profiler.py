@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from threading import Event, Thread
+from time import perf_counter_ns
+from errors import Position
+
+@dataclass(slots=True)
+class FunctionStats:
+    name: str
+    position: Position | None
+    calls: int = 0
+    inclusive: int = 0
+    exclusive: int = 0
+
+# profile of one or more interpreter runs. times are in nanoseconds for the deterministic
+# profiler and in samples for the sampling profiler, see `unit`
+class Profile:
+    def __init__(self, unit: str):
+        self.unit = unit
+        self.functions: dict[str, FunctionStats] = {}
+        self.edges: dict[tuple[str, str], int] = {}
+        self.stacks: dict[tuple[str, ...], int] = {}
+
+    def function(self, name: str, position: Position | None) -> FunctionStats:
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = FunctionStats(name, position)
+
+        return stats
+
+    # one "caller;callee value" line per distinct stack, as read by flamegraph.pl and speedscope
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {value}\n" for stack, value in sorted(self.stacks.items()) if value > 0)
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+
+    def table(self) -> str:
+        rows = sorted(self.functions.values(), key=lambda s: (-s.exclusive, -s.inclusive, s.name))
+        header = ["function", "location", "calls", f"inclusive ({self.unit})", f"exclusive ({self.unit})"]
+        lines = [header]
+
+        for s in rows:
+            location = f"{s.position.start_row}:{s.position.start_col}" if s.position else "builtin"
+            calls = str(s.calls) if self.unit == "ns" else "-"
+            lines.append([s.name, location, calls, str(s.inclusive), str(s.exclusive)])
+
+        widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+        return "\n".join("  ".join(c.ljust(w) if i < 2 else c.rjust(w) for i, (c, w) in enumerate(zip(line, widths))) for line in lines)
+
+# deterministic profiler, driven by the interpreter on every call and return.
+# an interpreter without a profiler never calls into this
+class Profiler:
+    def __init__(self):
+        self.profile = Profile("ns")
+
+        self.names: list[str] = []
+        self.starts: list[int] = []
+        self.children: list[int] = []
+        self.active: dict[str, int] = {}
+
+    def enter(self, name: str, position: Position | None, caller: str | None = None) -> None:
+        profile = self.profile
+        caller = caller or (self.names[-1] if self.names else None)
+
+        profile.function(name, position).calls += 1
+        if caller is not None:
+            profile.edges[(caller, name)] = profile.edges.get((caller, name), 0) + 1
+
+        self.active[name] = self.active.get(name, 0) + 1
+        self.names.append(name)
+        self.children.append(0)
+        self.starts.append(perf_counter_ns())
+
+    def leave(self) -> None:
+        elapsed = perf_counter_ns() - self.starts.pop()
+        own = elapsed - self.children.pop()
+        stack = tuple(self.names)
+        name = self.names.pop()
+
+        stats = self.profile.functions[name]
+        stats.exclusive += own
+        self.profile.stacks[stack] = self.profile.stacks.get(stack, 0) + own
+
+        # recursive activations only count towards inclusive time once
+        self.active[name] -= 1
+        if self.active[name] == 0:
+            stats.inclusive += elapsed
+
+        if self.children:
+            self.children[-1] += elapsed
+
+    # tail call: the callee takes over the current activation, but the edge is recorded
+    # from the function that made the call
+    def tail(self, name: str, position: Position | None) -> None:
+        caller = self.names[-1]
+        self.leave()
+        self.enter(name, position, caller)
+
+    def unwind(self, depth: int) -> None:
+        while len(self.names) > depth:
+            self.leave()
+
+# statistical profiler: a background thread records the interpreter's call stack every
+# `interval` seconds. the interpreter itself is not instrumented at all
+class SamplingProfiler:
+    def __init__(self, interpreter, interval: float = 0.001):
+        self.interpreter = interpreter
+        self.interval = interval
+        self.profile = Profile("samples")
+
+        self.__stop = Event()
+        self.__thread: Thread | None = None
+
+    def start(self) -> None:
+        self.__stop.clear()
+        self.__thread = Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> Profile:
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+        return self.profile
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def __run(self) -> None:
+        profile = self.profile
+        stack = self.interpreter.stack
+
+        while not self.__stop.wait(self.interval):
+            functions = [frame.function.function for frame in list(stack)]
+            if not functions:
+                continue
+
+            names = tuple(fn.name for fn in functions)
+            profile.stacks[names] = profile.stacks.get(names, 0) + 1
+
+            for fn in functions:
+                profile.function(fn.name, fn.position)
+
+            for name in set(names):
+                profile.functions[name].inclusive += 1
+
+            profile.functions[names[-1]].exclusive += 1
+
+            for edge in zip(names, names[1:]):
+                profile.edges[edge] = profile.edges.get(edge, 0) + 1
@@ -0,0 +1,74 @@
+from sys import stdout
+from typing import NamedTuple, TextIO
+from errors import CompileError, LineError
+from interpreter import Interpreter
+from ir import IRModule, lower_function
+from lexer import Lexer
+from parser import Parser
+from plast import Program, parse_tree_to_ast
+from validation import ValidationState, update_functions, validate_incremental
+
+class SessionResult(NamedTuple):
+    defined: list[str]
+    diagnostics: list[LineError]
+
+# persistent REPL state.
+#  - every input is lexed, parsed and validated on its own, against the functions the
+#    session already holds; only the new functions and the callers of redefined
+#    signatures are re-validated
+#  - an input with any error is rolled back, so the session only ever holds a valid program
+#  - functions are kept lowered to IR in a long-lived interpreter and never recompiled
+class Session:
+    def __init__(self, out: TextIO = stdout, redefine: bool = True):
+        self.redefine = redefine
+        self.state: ValidationState = validate_incremental(Program([], None))
+        self.interpreter = Interpreter(IRModule({}), out)
+        self.inputs = 0
+
+        # name of the input each function was defined in, for diagnostics
+        self.sources: dict[str, str] = {}
+
+    def submit(self, source: str) -> SessionResult:
+        self.inputs += 1
+        name = f"input{self.inputs}"
+
+        lexer = Lexer(source, name)
+        tokens = lexer.lex()
+        if lexer.errors:
+            return SessionResult([], lexer.line_errors())
+
+        try:
+            decls = parse_tree_to_ast(Parser(tokens, source).parse()).children
+        except CompileError as e:
+            return SessionResult([], [e.diagnostic(name)])
+
+        state = self.state
+        names = [c.name.token.content for c in decls]
+
+        for i, fname in enumerate(names):
+            if fname in names[:i] or (not self.redefine and fname in state.functions):
+                return SessionResult([], [CompileError.at(f"fun {fname} is already declared in scope", decls[i].name.token).diagnostic(name)])
+
+        previous = { fname: state.functions.get(fname) for fname in names }
+        update_functions(state, decls)
+
+        errors = list(state.errors.items())
+        if errors:
+            restore = [c for c in previous.values() if c is not None]
+            update_functions(state, restore, tuple(n for n, c in previous.items() if c is None))
+
+            # callers that failed against the rejected input are not necessarily callers of
+            # what was restored, so they are checked once more
+            if state.errors:
+                update_functions(state, [state.functions[n] for n in state.errors if n in state.functions])
+
+            return SessionResult([], [e.diagnostic(self.sources.get(n, name)) for n, e in errors])
+
+        for c in decls:
+            self.sources[c.name.token.content] = name
+            self.interpreter.define(lower_function(c))
+
+        return SessionResult(names, [])
+
+    def run(self, name: str = "main", args: tuple[int, ...] = ()) -> int | None:
+        return self.interpreter.run(name, args)
@@ -0,0 +1,165 @@
+import json
+from pathlib import Path
+from typing import NamedTuple
+from errors import CompileError, Position
+from ir import IRFunction, IRModule, Const, BinOp, Call, Ret, lower_program
+from lexer import Lexer
+from parser import Parser
+from passes import PassManager, inline, cse, dce, optimize
+from plast import parse_tree_to_ast
+from validation import FunctionSymbol, TypeSymbol, validate_ast
+from xref import XrefIndex
+
+# bumped whenever the layout of the artifacts below changes
+FORMAT_VERSION = 2
+
+# the compact part of a compiled unit: everything a dependent needs to validate against it
+class Interface(NamedTuple):
+    unit: str
+    exports: dict[str, FunctionSymbol]
+
+class ObjectFile(NamedTuple):
+    interface: Interface
+    # signatures of the imported functions the unit was validated against
+    imports: dict[str, FunctionSymbol]
+    module: IRModule
+
+# compiles a single unit. calls into other units are checked against their interfaces
+# only; the dependencies' sources are never touched
+def compile_unit(source: str, unit: str, interfaces: tuple[Interface, ...] = ()) -> ObjectFile:
+    lexer = Lexer(source, unit)
+    tokens = lexer.lex()
+
+    if lexer.errors:
+        err = lexer.line_errors()[0]
+        raise CompileError(err.message, err)
+
+    root = parse_tree_to_ast(Parser(tokens, source).parse())
+
+    available = { name: sym for i in interfaces for name, sym in i.exports.items() }
+    index = XrefIndex()
+    symbols = validate_ast(root, index, tuple(available.values()))
+
+    exports = { c.name.token.content: symbols.find_symbol(c.name.token.content) for c in root.children }
+    imports = { name: sym for name, sym in available.items() if index.find_references(name) }
+
+    # unreachable functions can only be told apart once every unit is linked
+    module = PassManager([inline(), cse, dce], max_iterations=4).run(lower_program(root))
+    return ObjectFile(Interface(unit, exports), imports, module)
+
+def compile_file(path: str | Path, interface_paths: tuple[str | Path, ...] = (), out_dir: str | Path | None = None) -> ObjectFile:
+    path = Path(path)
+    out_dir = Path(out_dir) if out_dir is not None else path.parent
+
+    interfaces = tuple(read_interface(p) for p in interface_paths)
+    obj = compile_unit(path.read_text(), path.stem, interfaces)
+
+    write_object(obj, out_dir / (path.stem + ".plo"))
+    write_interface(obj.interface, out_dir / (path.stem + ".pli"))
+    return obj
+
+# combines compiled units into one module. every import must be provided by exactly one
+# unit with the signature it was validated against
+def link(objects: list[ObjectFile], optimized: bool = True) -> IRModule:
+    functions = {}
+    owners: dict[str, str] = {}
+    exports: dict[str, FunctionSymbol] = {}
+
+    for obj in objects:
+        unit = obj.interface.unit
+
+        for name, fn in obj.module.functions.items():
+            if name in owners:
+                raise CompileError(f"fun {name} is defined in both {owners[name]} and {unit}")
+
+            owners[name] = unit
+            functions[name] = fn
+
+        exports.update(obj.interface.exports)
+
+    for obj in objects:
+        for name, sym in obj.imports.items():
+            if name not in exports:
+                raise CompileError(f"Unresolved fun {name} imported by {obj.interface.unit}")
+
+            if exports[name].signature() != sym.signature():
+                raise CompileError(f"{obj.interface.unit} was compiled against a different signature of fun {name} from {owners[name]}")
+
+    module = IRModule(functions)
+    return optimize(module) if optimized else module
+
+# artifacts are plain JSON, so reading one never runs code from it
+def write_interface(interface: Interface, path: str | Path) -> None:
+    __write(path, "interface", __encode_interface(interface))
+
+def read_interface(path: str | Path) -> Interface:
+    return __read(path, "interface", __decode_interface)
+
+def write_object(obj: ObjectFile, path: str | Path) -> None:
+    __write(path, "object", {
+        "interface": __encode_interface(obj.interface),
+        "imports": { name: __encode_symbol(sym) for name, sym in obj.imports.items() },
+        "functions": [__encode_function(fn) for fn in obj.module.functions.values()]
+    })
+
+def read_object(path: str | Path) -> ObjectFile:
+    return __read(path, "object", lambda data: ObjectFile(
+        __decode_interface(data["interface"]),
+        { name: __decode_symbol(sym) for name, sym in data["imports"].items() },
+        IRModule({ fn.name: fn for fn in map(__decode_function, data["functions"]) })))
+
+def __write(path: str | Path, kind: str, data: dict) -> None:
+    with open(path, "w") as f:
+        json.dump({ "format": FORMAT_VERSION, "kind": kind, **data }, f)
+
+def __read(path: str | Path, kind: str, decode):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+
+        if data["format"] != FORMAT_VERSION or data["kind"] != kind:
+            raise ValueError()
+
+        return decode(data)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise CompileError(f"{path} is not a valid {kind} file of format version {FORMAT_VERSION}")
+
+def __encode_interface(interface: Interface) -> dict:
+    return { "unit": interface.unit, "exports": { name: __encode_symbol(sym) for name, sym in interface.exports.items() } }
+
+def __decode_interface(data: dict) -> Interface:
+    return Interface(str(data["unit"]), { name: __decode_symbol(sym) for name, sym in data["exports"].items() })
+
+def __encode_symbol(sym: FunctionSymbol) -> dict:
+    return {
+        "name": sym.name,
+        "location": sym.location,
+        "parameters": [list(t) for t in sym.parameters],
+        "return_type": list(sym.return_type),
+        "pure": sym.pure
+    }
+
+def __decode_symbol(data: dict) -> FunctionSymbol:
+    params = [TypeSymbol(str(name), str(location)) for name, location in data["parameters"]]
+    name, location = data["return_type"]
+    return FunctionSymbol(str(data["name"]), str(data["location"]), params, TypeSymbol(str(name), str(location)), bool(data["pure"]))
+
+INSTRUCTIONS = { t.__name__: t for t in (Const, BinOp, Call, Ret) }
+
+def __encode_function(fn: IRFunction) -> dict:
+    return {
+        "name": fn.name,
+        "params": fn.params,
+        "pure": fn.pure,
+        "body": [[type(i).__name__, *i] for i in fn.body],
+        "position": list(fn.position) if fn.position is not None else None
+    }
+
+def __decode_function(data: dict) -> IRFunction:
+    body = []
+    for kind, *fields in data["body"]:
+        instr = INSTRUCTIONS[kind](*fields)
+        body.append(instr._replace(args=tuple(instr.args)) if type(instr) == Call else instr)
+
+    position = Position(*data["position"]) if data["position"] is not None else None
+    return IRFunction(str(data["name"]), [str(p) for p in data["params"]], bool(data["pure"]), body, position)
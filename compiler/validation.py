@@ -1,7 +1,10 @@
 from typing import NamedTuple
-from errors import construct_line, write_single_err, LineError
-from plast import Node, Program, FunctionDecl, Expression, FunctionCall, Identifier, \
-    IntegerLiteral, Statement, BinaryOperation
+from errors import CompileError, Position
+from lexer import Token, TokenType
+from plast import AstToken, AstVisitor, HashConsTable, LazyExpression, Node, Program, FunctionDecl, Expression, FunctionCall, Identifier, \
+    IntegerLiteral, Statement, BinaryOperation, is_pure
+from visitor import visits
+from xref import XrefIndex
 
 class FunctionSymbol(NamedTuple):
     name: str
@@ -10,17 +13,27 @@ class FunctionSymbol(NamedTuple):
     return_type: 'TypeSymbol'
     pure: bool
 
+    # everything callers depend on, i.e. all but where the function was declared
+    def signature(self) -> tuple:
+        return (self.name, tuple(self.parameters), self.return_type, self.pure)
+
 class TypeSymbol(NamedTuple):
     name: str
     location: str
 
-Symbol = FunctionSymbol | TypeSymbol
+class ParamSymbol(NamedTuple):
+    name: str
+    location: str
+    type: 'TypeSymbol'
+
+Symbol = FunctionSymbol | TypeSymbol | ParamSymbol
 
 class SymbolTable:
     symbols: dict['str', 'Symbol']
 
-    def __init__(self):
+    def __init__(self, parent: 'SymbolTable | None' = None):
         self.symbols = {}
+        self.parent = parent
 
     def exists_symbol(self, sym: Symbol) -> bool:
         return sym in self.symbols.values()
@@ -29,7 +42,7 @@ class SymbolTable:
         return name in self.symbols
 
     def add_symbol(self, sym: Symbol) -> bool:
-        if self.exists_symbol(sym):
+        if self.exists_name(sym.name):
             return False
 
         self.symbols[sym.name] = sym
@@ -38,36 +51,33 @@ class SymbolTable:
     def find_symbol(self, name: str) -> Symbol | None:
         if self.exists_name(name):
             return self.symbols[name]
+        elif self.parent:
+            return self.parent.find_symbol(name)
 
         return False
 
-def validate_ast(root: Program):
+# imports are the symbols of other compilation units the program may call.
+# for a hash-consed AST:
+#  - memoize types every shared node only once; it has no effect while indexing, as the
+#    index needs to see every occurrence
+#  - table must be the HashConsTable the AST was built with when indexing it or for errors
+#    to point at the right occurrence, as a shared node only carries the tokens of its first
+#    occurrence
+def validate_ast(root: Program, index: XrefIndex | None = None, imports: tuple[FunctionSymbol, ...] = (), memoize: bool = False,
+        table: HashConsTable | None = None) -> SymbolTable:
     symbols = __generate_default_symbols()
+    memo = {} if memoize and index is None else None
+
+    for sym in imports:
+        if not symbols.add_symbol(sym):
+            raise CompileError(f"Imported fun {sym.name} from {sym.location} is already declared in scope")
 
     # phase 1: symbol table generation
     for c in root.children:
         if (type(c) != FunctionDecl):
             pass
-            
-        params = []
-        for p in c.parameters.params:
-            name = p.type.token.content
-            sym = symbols.find_symbol(name)
-
-            if not sym or type(sym) != TypeSymbol:
-                raise Exception(f"Unknown type {name}")
 
-            params.append(p)
-
-        ret = c.type.type.token.content
-        retsym = symbols.find_symbol(ret)
-
-        if not retsym or type(retsym) != TypeSymbol:
-            raise Exception(f"Unknown type {ret}")
-
-        fsym = FunctionSymbol(c.name.token.content, "sex", params, retsym, c.pure)
-        if not symbols.add_symbol(fsym):
-            raise Exception(f"fun {fsym.name} is already declared in scope")
+        __declare_function(c, symbols, index)
 
     # phase 2: fun validation
     #  - return type must match value of expr
@@ -76,74 +86,371 @@ def validate_ast(root: Program):
         if (type(c) != FunctionDecl):
             pass
 
-        ret_type = symbols.find_symbol(c.type.type.token.content)
-        body_type = __get_expression_type(c.body, symbols, c.pure)
+        __check_function(c, symbols, index, memo, table)
+
+    return symbols
+
+class ValidationState:
+    def __init__(self, symbols: 'SymbolTable'):
+        self.symbols = symbols
+        self.index = XrefIndex()
+        self.functions: dict[str, FunctionDecl] = {}
+        self.fingerprints: dict[str, int] = {}
+        self.errors: dict[str, CompileError] = {}
+
+        # names declared more than once in the last run
+        self.duplicates: set[str] = set()
+
+        # names re-checked by the most recent update
+        self.rechecked: set[str] = set()
+
+# incremental variant of validate_ast.
+#  - functions whose tokens are unchanged since the last run keep their previous result
+#  - edited functions are re-checked, along with the callers of every function whose
+#    signature (parameters, return type, purity) changed or which was added or removed
+#  - errors are collected per function in state.errors instead of being raised
+def validate_incremental(root: Program, state: ValidationState | None = None) -> ValidationState:
+    state = state or ValidationState(__generate_default_symbols())
+
+    # a duplicated name carries the duplicate error instead of its own result, so it is
+    # always checked again
+    for name in state.duplicates:
+        state.fingerprints.pop(name, None)
+
+    changed: list[FunctionDecl] = []
+    duplicates: list[str] = []
+    seen: set[str] = set()
+
+    for c in root.children:
+        name = c.name.token.content
+        if name in seen:
+            duplicates.append(name)
+            continue
+
+        seen.add(name)
+        fingerprint = __fingerprint(c)
+
+        if state.fingerprints.get(name) != fingerprint:
+            changed.append(c)
+            state.fingerprints[name] = fingerprint
+        elif name in state.errors and __first_token(state.functions[name]).position != __first_token(c).position:
+            # a stored error holds absolute positions, so a moved function with an error is checked again
+            changed.append(c)
+        elif state.functions[name] is not c:
+            __relocate(state, state.functions[name], c)
+
+    removed = [name for name in state.functions if name not in seen]
+    update_functions(state, changed, removed)
+
+    for name in duplicates:
+        state.errors[name] = CompileError(f"fun {name} is already declared in scope")
+
+    state.duplicates = set(duplicates)
+
+    # keep state.functions in program order
+    state.functions = { c.name.token.content: state.functions[c.name.token.content] for c in root.children }
+    return state
+
+def update_functions(state: ValidationState, decls: list[FunctionDecl], removed: tuple[str, ...] = ()) -> ValidationState:
+    symbols = state.symbols
+    index = state.index
+    recheck: set[str] = set()
+
+    old_signatures: dict[str, Symbol | None] = {}
+    for name in [c.name.token.content for c in decls] + list(removed):
+        old_signatures[name] = symbols.symbols.pop(name, None)
+        index.remove_function(name)
+
+    for name in removed:
+        state.functions.pop(name, None)
+        state.fingerprints.pop(name, None)
+        state.errors.pop(name, None)
+
+    for c in decls:
+        name = c.name.token.content
+        state.functions[name] = c
+        state.errors.pop(name, None)
+        recheck.add(name)
+
+        try:
+            __declare_function(c, symbols, index)
+        except CompileError as e:
+            state.errors[name] = e
+
+    for name, old in old_signatures.items():
+        if __signature(symbols.symbols.get(name)) != __signature(old):
+            recheck |= index.callers_of(name)
+
+        # calls to a function that did not resolve yet were never indexed
+        if old is None:
+            recheck |= set(state.errors)
+
+    state.rechecked = set()
+    for name in recheck:
+        c = state.functions.get(name)
+        if c is None or not symbols.exists_name(name):
+            continue
+
+        index.remove_function(name)
+        index.add_definition(name, "function", name, c.name.token.position)
+        state.errors.pop(name, None)
+        state.rechecked.add(name)
+
+        try:
+            __check_function(c, symbols, index)
+        except CompileError as e:
+            state.errors[name] = e
+
+    return state
+
+def __declare_function(c: FunctionDecl, symbols: SymbolTable, index: XrefIndex | None) -> FunctionSymbol:
+    params = []
+    for p in c.parameters.params:
+        name = p.type.type.token.content
+        sym = symbols.find_symbol(name)
+
+        if not sym or type(sym) != TypeSymbol:
+            raise CompileError.at(f"Unknown type {name}", p.type.type.token)
+
+        params.append(sym)
+
+    ret = c.type.type.token.content
+    retsym = symbols.find_symbol(ret)
+
+    if not retsym or type(retsym) != TypeSymbol:
+        raise CompileError.at(f"Unknown type {ret}", c.type.type.token)
+
+    fsym = FunctionSymbol(c.name.token.content, c.name.token.source, params, retsym, is_pure(c))
+    if not symbols.add_symbol(fsym):
+        raise CompileError.at(f"fun {fsym.name} is already declared in scope", c.name.token)
+
+    if index is not None:
+        index.add_definition(fsym.name, "function", fsym.name, c.name.token.position)
+
+    return fsym
+
+def __check_function(c: FunctionDecl, symbols: SymbolTable, index: XrefIndex | None, memo: dict | None = None,
+        table: HashConsTable | None = None) -> None:
+    fsym = symbols.find_symbol(c.name.token.content)
+    scope = SymbolTable(symbols)
+
+    for p, ptype in zip(c.parameters.params, fsym.parameters):
+        psym = ParamSymbol(p.name.token.content, fsym.name, ptype)
+        if not scope.add_symbol(psym):
+            raise CompileError.at(f"Parameter {psym.name} is already declared in fun {fsym.name}", p.name.token)
+
+        if index is not None:
+            index.add_definition(f"{fsym.name}.{psym.name}", "parameter", fsym.name, p.name.token.position)
+
+    ret_type = fsym.return_type
+    if memo is not None:
+        typer = MemoizedExpressionTyper(scope, fsym.pure, memo, table)
+    else:
+        typer = ExpressionTyper(scope, fsym.pure, index, fsym.name, table)
+
+    body_type = typer.visit(c.body)
 
-        if ret_type != body_type:
-            val = construct_line(c.type.type.token)
-            print(val)
-            print("'" + val + "'")
-            write_single_err(LineError(f"Function body return type {body_type.name} does not match declared return type {ret_type.name}",
-                c.type.type.token.source, construct_line(c.type.type.token), c.type.type.token.position))
-            raise Exception(f"Function body return type {body_type.name} does not match declared return type {ret_type.name}")
+    if ret_type != body_type:
+        raise CompileError.at(f"Function body return type {body_type.name} does not match declared return type {ret_type.name}", c.type.type.token)
+
+# hash of the declaration's source text, from its first to its last token. equal
+# fingerprints mean the declaration's text, and so the layout of its tokens relative to
+# each other, is unchanged
+def __fingerprint(c: FunctionDecl) -> int:
+    token = __first_token(c)
+    last = __last_token(c)
+    contents = [token.content]
+
+    while token is not last:
+        token = token.right
+        contents.append(token.content)
+
+    return hash(tuple(contents))
+
+def __signature(sym: Symbol | None) -> tuple | None:
+    return sym.signature() if type(sym) == FunctionSymbol else None
+
+def __first_token(c: FunctionDecl) -> Token:
+    return (c.pure or c.name).token
+
+def __last_token(c: FunctionDecl) -> Token:
+    if type(c.body) == LazyExpression:
+        span = c.body.span
+        return span.tokens[span.end - 1]
+
+    return c.body.right_brace.token
+
+# an unchanged function that moved in the source keeps its validation result, but its
+# index entries are shifted to the new location
+def __relocate(state: ValidationState, old: FunctionDecl, new: FunctionDecl) -> None:
+    before = __first_token(old).position
+    after = __first_token(new).position
+
+    state.functions[new.name.token.content] = new
+    state.index.relocate(new.name.token.content, before, after)
 
 def __generate_default_symbols():
     st = SymbolTable()
 
-    t_int = st.add_symbol(TypeSymbol("int", "builtin"))
-    t_void = st.add_symbol(TypeSymbol("void", "builtin"))
+    t_int = TypeSymbol("int", "builtin")
+    t_void = TypeSymbol("void", "builtin")
+    st.add_symbol(t_int)
+    st.add_symbol(t_void)
     st.add_symbol(FunctionSymbol("print", "std.io", [t_int], t_void, False))
 
     return st
 
-def __get_expression_type(expr: Node, symtable: SymbolTable, pure_only: bool): 
-    t = type(expr)
-    
-    if t == Statement:
-        return symtable.find_symbol("void")
-
-    elif t == IntegerLiteral:
-        return symtable.find_symbol("int")
-
-    elif t == FunctionCall:
-        fcall = symtable.find_symbol(expr.name.token.content)
+# computes the type of an expression, checking calls and identifiers along the way
+class ExpressionTyper(AstVisitor):
+    def __init__(self, symtable: SymbolTable, pure_only: bool, index: XrefIndex | None = None, function: str | None = None,
+            table: HashConsTable | None = None):
+        self.symtable = symtable
+        self.pure_only = pure_only
+        self.index = index
+        self.function = function
+        self.table = table
+
+        # occurrences of shared nodes in source order, and how many of them were visited
+        self.occurrences: dict[int, list[Token]] = {}
+        self.visited: dict[int, int] = {}
+
+    @visits(Statement)
+    def visit_statement(self, expr: Statement):
+        self.visit(expr.child)
+        return self.symtable.find_symbol("void")
+
+    @visits(IntegerLiteral)
+    def visit_integer(self, expr: IntegerLiteral):
+        return self.symtable.find_symbol("int")
+
+    @visits(FunctionCall)
+    def visit_function_call(self, expr: FunctionCall):
+        fcall = self.symtable.find_symbol(expr.name.token.content)
         if not fcall or type(fcall) != FunctionSymbol:
-            raise Exception(f"Could not find function '{expr.name.token.content}'")
-        
-        tsym = symtable.find_symbol(fcall.return_type)
+            raise CompileError.at(f"Could not find function '{expr.name.token.content}'", expr.name.token)
         
-        if pure_only and not fcall.pure:
-            raise Exception(f"Can't invoke impure function '{expr.name.token.content}' from pure context")
+        # recorded before any check that can fail, so a failing caller is still re-checked
+        # when the callee changes
+        if self.index is not None:
+            self.index.add_reference(fcall.name, self.function, self.position(expr, expr.name.token))
+            self.index.add_call(self.function, fcall.name)
 
-        return tsym
+        if self.pure_only and not fcall.pure:
+            raise CompileError.at(f"Can't invoke impure function '{expr.name.token.content}' from pure context", expr.name.token)
 
-    elif t == Identifier:
-        ident = symtable.find_symbol(expr.value)
-        if not ident:
-            raise Exception(f"Use of undeclared symbol {expr.value}")
+        args = expr.arguments.args
+        if len(args) != len(fcall.parameters):
+            raise CompileError.at(f"fun {fcall.name} expects {len(fcall.parameters)} arguments, got {len(args)}", expr.name.token)
 
-        return ident
+        for arg, ptype in zip(args, fcall.parameters):
+            atype = self.visit(arg)
+            if atype != ptype:
+                raise CompileError.at(f"Argument of type {atype.name} passed to fun {fcall.name} where {ptype.name} was expected", expr.name.token)
 
-    elif t == Expression:
-        ty = None
+        return fcall.return_type
 
-        for c in expr.children:
-            if type(c) == Statement:
-                pass
+    @visits(Identifier)
+    def visit_identifier(self, expr: Identifier):
+        ident = self.symtable.find_symbol(expr.value)
+        if not ident or type(ident) != ParamSymbol:
+            raise CompileError.at(f"Use of undeclared symbol {expr.value}", expr.token.token)
 
-            elif not ty:
-                ty = __get_expression_type(c, symtable, pure_only)
-            
-            else:
-                raise Exception("Unexpected statement after expression")
+        if self.index is not None:
+            self.index.add_reference(f"{ident.location}.{ident.name}", self.function, self.position(expr, expr.token.token))
 
-        return ty or symtable.find_symbol("void")
+        return ident.type
 
-    elif t == BinaryOperation:
-        left_type = __get_expression_type(expr.left, symtable, pure_only)
-        right_type = __get_expression_type(expr.right, symtable, pure_only)
-        if left_type == right_type:
-            return left_type
+    @visits(Expression)
+    def visit_expression(self, expr: Expression):
+        ty = None
 
-    else:
-        raise Exception(f"Cannot get type for AST node of type {t}")
\ No newline at end of file
+        for c in expr.children:
+            # the value, if any, ends the block
+            if ty:
+                raise CompileError.at("Unexpected statement after expression", self.edge_token(c, True))
+
+            if type(c) == Statement:
+                self.visit(c)
+            else:
+                ty = self.visit(c)
+
+        return ty or self.symtable.find_symbol("void")
+
+    @visits(BinaryOperation)
+    def visit_binary_operation(self, expr: BinaryOperation):
+        left_type = self.visit(expr.left)
+        right_type = self.visit(expr.right)
+        int_type = self.symtable.find_symbol("int")
+
+        if left_type != int_type or right_type != int_type:
+            token = self.occurrence(expr) if self.table is not None else self.operator_token(expr, right_type != int_type)
+            raise CompileError.at(f"Operator {expr.op} expects int operands, got {left_type.name} and {right_type.name}", token)
+
+        return int_type
+
+    # the operator itself is not kept in the AST, it is the token next to the operand that
+    # failed the check. a hash-consed AST records the operator token of every occurrence instead
+    def operator_token(self, expr: BinaryOperation, from_right: bool) -> Token:
+        token = self.edge_token(expr.right, True).left if from_right else self.edge_token(expr.left, False).right
+        while token.type == TokenType.Whitespace:
+            token = token.left if from_right else token.right
+
+        return token
+
+    # first or last token of an expression
+    def edge_token(self, node: Node, first: bool) -> Token:
+        while type(node) != AstToken:
+            if type(node) == BinaryOperation:
+                node = node.left if first else node.right
+            elif type(node) == Expression:
+                node = (node.left_brace or node.children[0]) if first else (node.right_brace or node.children[-1])
+            elif type(node) == FunctionCall:
+                node = node.name if first else node.arguments.right_paren
+            elif type(node) == Statement:
+                node = node.child if first else node.semi
+            else:
+                node = node.token
+
+        return node.token
+
+    # position of the occurrence being visited
+    def position(self, expr: Node, token: Token) -> Position:
+        return self.occurrence(expr).position if self.table is not None else token.position
+
+    # token recorded for the occurrence of a shared node being visited. calls, identifiers and
+    # operations over them are only shared within one function, whose body is visited once in
+    # source order. a memoized typer visits a shared node only once, so this is its first
+    # occurrence, the one that fails a check
+    def occurrence(self, expr: Node) -> Token:
+        key = id(expr)
+        if key not in self.occurrences:
+            self.occurrences[key] = sorted(self.table.occurrences(expr), key=lambda t: t.position.index)
+
+        seen = self.visited.get(key, 0)
+        self.visited[key] = seen + 1
+        return self.occurrences[key][seen]
+
+    def generic_visit(self, expr: Node):
+        raise CompileError(f"Cannot get type for AST node of type {type(expr)}")
+
+# typer for hash-consed ASTs: a shared call or operation is typed once per purity context.
+# identifiers and calls are interned per function, so a shared subtree that can fail a check
+# always belongs to the function being checked
+class MemoizedExpressionTyper(ExpressionTyper):
+    def __init__(self, symtable: SymbolTable, pure_only: bool, memo: dict, table: HashConsTable | None = None):
+        super().__init__(symtable, pure_only, table=table)
+        self.memo = memo
+
+    def visit_function_call(self, expr: FunctionCall):
+        key = (id(expr), self.pure_only)
+        if key not in self.memo:
+            self.memo[key] = super().visit_function_call(expr)
+
+        return self.memo[key]
+
+    def visit_binary_operation(self, expr: BinaryOperation):
+        key = (id(expr), self.pure_only)
+        if key not in self.memo:
+            self.memo[key] = super().visit_binary_operation(expr)
+
+        return self.memo[key]
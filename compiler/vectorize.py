@@ -0,0 +1,86 @@
+from math import inf
+from operator import add, sub, mul
+from ir import IRModule, Const, BinOp, Call, lower_function
+from passes import PassManager, inline, cse, dce
+from plast import FunctionDecl, Program, is_pure
+
+# batch evaluation of a pure integer function over whole NumPy arrays.
+#  - the function and everything it calls are inlined into one straight-line body when the
+#    kernel is built, so applying it is a handful of array operations
+#  - arithmetic follows NumPy int64 rules: results wrap on overflow instead of growing like
+#    the interpreter's, and "/" floors like the interpreter's division
+class Kernel:
+    def __init__(self, name: str, params: list[str], body: list):
+        self.name = name
+        self.params = params
+        self.body = body
+
+    def __call__(self, *arrays):
+        import numpy as np
+
+        if len(arrays) != len(self.params):
+            raise Exception(f"fun {self.name} expects {len(self.params)} arguments, got {len(arrays)}")
+
+        values = { p: np.asarray(a, dtype=np.int64) for p, a in zip(self.params, arrays) }
+        shape = np.broadcast_shapes(*(v.shape for v in values.values()))
+
+        for instr in self.body:
+            if type(instr) == Const:
+                values[instr.dest] = np.int64(instr.value)
+
+            elif type(instr) == BinOp:
+                left, right = values[instr.left], values[instr.right]
+
+                if instr.op == "/":
+                    if np.any(right == 0):
+                        raise Exception(f"Division by zero in fun {self.name}")
+                    values[instr.dest] = np.floor_divide(left, right)
+                else:
+                    values[instr.dest] = OPS[instr.op](left, right)
+
+            else:
+                return np.broadcast_to(values[instr.value], shape).copy()
+
+OPS = {
+    "+": add,
+    "-": sub,
+    "*": mul
+}
+
+# builds a kernel for `decl`, a validated function of `program`. raises if the function,
+# or anything it calls, is impure, recursive or not int-only
+def vectorize(decl: FunctionDecl, program: Program) -> Kernel:
+    decls = { c.name.token.content: c for c in program.children }
+    functions = {}
+    stack = [decl]
+
+    while stack:
+        c = stack.pop()
+        name = c.name.token.content
+        if name in functions:
+            continue
+
+        if not is_pure(c):
+            raise Exception(f"Cannot vectorize impure fun {name}")
+
+        types = [p.type.type.token.content for p in c.parameters.params] + [c.type.type.token.content]
+        if any(t != "int" for t in types):
+            raise Exception(f"Cannot vectorize fun {name}: only int parameters and results are supported")
+
+        fn = functions[name] = lower_function(c)
+
+        for instr in fn.body:
+            if type(instr) == Call:
+                if instr.name not in decls:
+                    raise Exception(f"Cannot vectorize call to fun {instr.name} from fun {name}")
+                stack.append(decls[instr.name])
+
+    module = IRModule(functions)
+    name = decl.name.token.content
+    PassManager([inline(max_size=inf), cse, dce], max_iterations=len(functions) + 1).run(module)
+
+    fn = module.functions[name]
+    if any(type(i) == Call for i in fn.body):
+        raise Exception(f"Cannot vectorize recursive fun {name}")
+
+    return Kernel(name, fn.params, fn.body)
@@ -0,0 +1,98 @@
+from typing import Callable
+
+class StopVisit(Exception):
+    def __init__(self, value = None):
+        super().__init__(value)
+        self.value = value
+
+def visits(*keys):
+    def decorate(fn):
+        fn.visits = keys
+        return fn
+
+    return decorate
+
+# visitor base with a dispatch table built once per class.
+#  - methods decorated with @visits(...) handle the given keys; the key of a node is its
+#    type unless the subclass overrides `key` (the parse tree dispatches on ParseTreeNode.type)
+#  - nodes without a handler go to generic_visit
+#  - pre_visit returning False skips a node, post_visit may replace its result. the hooks
+#    are only called by classes that override them and do not define their own visit
+#  - stop() ends the whole traversal started by run(), which returns the given value
+class Visitor:
+    key: Callable = staticmethod(type)
+    dispatch: dict = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        names = {}
+        for klass in reversed(cls.__mro__):
+            for name, attr in vars(klass).items():
+                for k in getattr(attr, "visits", ()):
+                    names[k] = name
+
+        cls.dispatch = { k: getattr(cls, name) for k, name in names.items() }
+
+        # a visit defined by the subclass itself is left alone
+        if cls.visit in (Visitor.visit, Visitor._visit, Visitor._visit_hooked):
+            hooked = cls.pre_visit is not Visitor.pre_visit or cls.post_visit is not Visitor.post_visit
+            cls.visit = Visitor._visit_hooked if hooked else Visitor._visit
+
+    def run(self, node, *args):
+        try:
+            return self.visit(node, *args)
+        except StopVisit as e:
+            return e.value
+
+    def visit(self, node, *args):
+        return self._visit(node, *args)
+
+    def stop(self, value = None):
+        raise StopVisit(value)
+
+    def generic_visit(self, node, *args):
+        raise NotImplementedError(f"{type(self).__name__} not implemented for {self.key(node)}")
+
+    def pre_visit(self, node) -> bool:
+        return True
+
+    def post_visit(self, node, result):
+        return result
+
+    def _visit(self, node, *args):
+        fn = self.dispatch.get(self.key(node))
+        if fn is None:
+            return self.generic_visit(node, *args)
+
+        return fn(self, node, *args)
+
+    def _visit_hooked(self, node, *args):
+        if self.pre_visit(node) is False:
+            return None
+
+        return self.post_visit(node, self._visit(node, *args))
+
+# visitor that rebuilds NamedTuple nodes. by default every NamedTuple child (directly or
+# inside a list) is visited, and a node is only copied when one of its children changed
+class Transformer(Visitor):
+    def generic_visit(self, node, *args):
+        if not hasattr(node, "_fields"):
+            return node
+
+        values = []
+        changed = False
+
+        for value in node:
+            if type(value) == list:
+                new = [self.visit(v, *args) if hasattr(v, "_fields") else v for v in value]
+                changed = changed or any(a is not b for a, b in zip(new, value))
+            elif hasattr(value, "_fields"):
+                new = self.visit(value, *args)
+                changed = changed or new is not value
+            else:
+                new = value
+
+            values.append(new)
+
+        return type(node)(*values) if changed else node
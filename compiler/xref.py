@@ -0,0 +1,136 @@
+from bisect import bisect_right
+from typing import NamedTuple
+from errors import Position
+
+class Definition(NamedTuple):
+    name: str
+    kind: str
+    function: str
+    position: Position
+
+class Reference(NamedTuple):
+    name: str
+    function: str
+    position: Position
+
+# cross-reference index filled in by validate_ast.
+#  - names are qualified: functions by their own name, parameters as "function.param"
+#  - every definition and reference is owned by the function it appears in, so a single
+#    function's entries can be dropped, rebuilt or moved without touching the rest.
+#    references are grouped by owner for the same reason
+#  - entries keep the position they were recorded at. a function that moved without
+#    changing gets an offset instead, applied when its entries are read, so moving it does
+#    not depend on how many entries it owns. a function's entries are only recorded again
+#    after remove_function, which drops its offset
+class XrefIndex:
+    def __init__(self):
+        self.definitions: dict[str, Definition] = {}
+        self.references: dict[str, dict[str, list[Reference]]] = {}
+        self.callees: dict[str, set[str]] = {}
+        self.callers: dict[str, set[str]] = {}
+
+        self.__owned: dict[str, list[Definition | Reference]] = {}
+        # function -> (index, row and column shift, and the recorded row of its first token,
+        # whose entries alone are shifted by columns)
+        self.__offsets: dict[str, tuple[int, int, int, int]] = {}
+        self.__spans: list[tuple[int, int, str]] = []
+        self.__starts: list[int] = []
+        self.__dirty = False
+
+    def add_definition(self, name: str, kind: str, function: str, position: Position) -> None:
+        definition = Definition(name, kind, function, position)
+        self.definitions[name] = definition
+        self.__owned.setdefault(function, []).append(definition)
+        self.__dirty = True
+
+    def add_reference(self, name: str, function: str, position: Position) -> None:
+        reference = Reference(name, function, position)
+        self.references.setdefault(name, {}).setdefault(function, []).append(reference)
+        self.__owned.setdefault(function, []).append(reference)
+        self.__dirty = True
+
+    def add_call(self, caller: str, callee: str) -> None:
+        self.callees.setdefault(caller, set()).add(callee)
+        self.callers.setdefault(callee, set()).add(caller)
+
+    def remove_function(self, function: str) -> None:
+        self.__offsets.pop(function, None)
+
+        for entry in self.__owned.pop(function, []):
+            if type(entry) == Definition:
+                if self.definitions.get(entry.name) == entry:
+                    del self.definitions[entry.name]
+            else:
+                refs = self.references.get(entry.name)
+                if refs is not None and refs.pop(function, None) is not None and not refs:
+                    del self.references[entry.name]
+
+        for callee in self.callees.pop(function, set()):
+            self.callers[callee].discard(function)
+
+        self.__dirty = True
+
+    # shifts a function's entries after it moved from `before` to `after` without changing its text
+    def relocate(self, function: str, before: Position, after: Position) -> None:
+        d_index = after.index - before.index
+        d_row = after.start_row - before.start_row
+        d_col = after.start_col - before.start_col
+
+        if d_index == 0 and d_row == 0 and d_col == 0:
+            return
+
+        index, row, col, first_row = self.__offsets.get(function, (0, 0, 0, before.start_row))
+        self.__offsets[function] = (index + d_index, row + d_row, col + d_col, first_row)
+        self.__dirty = True
+
+    # queries
+    def definition(self, name: str) -> Definition | None:
+        definition = self.definitions.get(name)
+        return self.__moved(definition) if definition is not None else None
+
+    def find_references(self, name: str) -> list[Reference]:
+        return [self.__moved(r) for refs in self.references.get(name, {}).values() for r in refs]
+
+    def callers_of(self, name: str) -> set[str]:
+        return self.callers.get(name, set())
+
+    def callees_of(self, name: str) -> set[str]:
+        return self.callees.get(name, set())
+
+    def symbol_at(self, index: int) -> str | None:
+        if self.__dirty:
+            self.__rebuild_spans()
+
+        i = bisect_right(self.__starts, index) - 1
+        if i < 0:
+            return None
+
+        start, end, name = self.__spans[i]
+        return name if start <= index < end else None
+
+    def definition_at(self, index: int) -> Definition | None:
+        name = self.symbol_at(index)
+        return self.definition(name) if name is not None else None
+
+    def __rebuild_spans(self) -> None:
+        spans = []
+        for entries in self.__owned.values():
+            for entry in entries:
+                pos = self.__moved(entry).position
+                spans.append((pos.index, pos.index + pos.end_col - pos.start_col, entry.name))
+
+        spans.sort()
+        self.__spans = spans
+        self.__starts = [s[0] for s in spans]
+        self.__dirty = False
+
+    def __moved(self, entry: Definition | Reference) -> Definition | Reference:
+        offset = self.__offsets.get(entry.function)
+        if offset is None:
+            return entry
+
+        d_index, d_row, d_col, first_row = offset
+        pos = entry.position
+        col = d_col if pos.start_row == first_row else 0
+        return entry._replace(position=Position(pos.index + d_index, pos.start_row + d_row, pos.start_col + col,
+            pos.end_row + d_row, pos.end_col + col))
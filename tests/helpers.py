@@ -0,0 +1,15 @@
+from ir import IRModule, lower_program
+from lexer import Lexer
+from parser import Parser
+from plast import HashConsTable, Program, parse_tree_to_ast
+from validation import validate_ast
+
+# source to AST and IR, shared by the test modules
+
+def parse(source: str, lazy: bool = False, table: HashConsTable | None = None) -> Program:
+    return parse_tree_to_ast(Parser(Lexer(source, "s").lex(), source, lazy).parse(), table)
+
+def build(source: str) -> IRModule:
+    ast = parse(source)
+    validate_ast(ast)
+    return lower_program(ast)
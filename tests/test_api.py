@@ -0,0 +1,47 @@
+import pytest
+from api import CompileOptions, compile
+
+PROGRAM = """imp main(): int { print(sq(3)); add(sq(2), 3) }
+fun sq(x: int): int { x * x }
+fun add(a: int, b: int): int { a + b / 2 }
+"""
+
+def test_valid_program():
+    result = compile(PROGRAM, "t")
+
+    assert result.ok
+    assert "main" in result.module.functions
+
+@pytest.mark.parametrize("source, message", [
+    ("fun f(): int { 1 }x", "Expected token of type TokenType.LeftParen"),
+    ("imp f(x: int): int { f(1 + print(2)) }", "Operator + expects int operands, got int and void"),
+    ("fun é(): int { 1 }", "Unrecognized character: 'é'"),
+    ("fun f(): int { 1² }", "Unrecognized character: '²'"),
+    ("fun f(): int { g() }", "Could not find function 'g'"),
+])
+def test_malformed_source(source, message):
+    result = compile(source, "t")
+
+    assert not result.ok
+    assert result.diagnostics[0].message.startswith(message)
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_edited_sources_never_raise(lazy):
+    options = CompileOptions(lazy=lazy)
+
+    for i in range(len(PROGRAM) + 1):
+        for source in (PROGRAM[:i], PROGRAM[:i] + PROGRAM[i + 1:], PROGRAM[:i] + "é" + PROGRAM[i:], PROGRAM[:i] + "}" + PROGRAM[i:]):
+            result = compile(source, "t", options)
+            assert result.ok or result.diagnostics
+
+def test_parallel_lexing_through_a_pool():
+    from concurrent.futures import ThreadPoolExecutor
+
+    source = PROGRAM + "".join(f"fun f{i}(x: int): int {{ x * {i} + sq(x) }}\n" for i in range(4000)) + "fun g(): int { é }"
+
+    with ThreadPoolExecutor(2) as pool:
+        result = compile(source, "t", CompileOptions(lex_pool=pool, lex_workers=2))
+
+    expected = compile(source, "t")
+    assert [(t.type, t.position) for t in result.tokens] == [(t.type, t.position) for t in expected.tokens]
+    assert result.diagnostics == expected.diagnostics
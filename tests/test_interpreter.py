@@ -0,0 +1,65 @@
+import io
+import pytest
+from errors import CompileError
+from helpers import build
+from interpreter import Interpreter
+from passes import optimize
+
+def test_void_arithmetic_is_rejected_before_running():
+    with pytest.raises(CompileError, match="Operator \\+ expects int operands, got void and void"):
+        build("imp main(): void { print(1) + print(2) }")
+
+def test_tail_calls_run_in_constant_space():
+    # there is no branching yet, so the countdown ends with a division by zero
+    module = build("fun count(n: int): int { count(n - 1 + 1 / n - 1 / n) }\nimp main(): int { count(100000) }")
+
+    with pytest.raises(Exception, match="Division by zero"):
+        Interpreter(module, max_depth=10).run()
+
+@pytest.mark.parametrize("optimized", [False, True])
+def test_program_output(optimized):
+    module = build("fun sq(x: int): int { x * x }\nimp main(): int { print(sq(3)); sq(4) + 12 / 5 }")
+    if optimized:
+        optimize(module)
+
+    out = io.StringIO()
+    assert Interpreter(module, out).run() == 18
+    assert out.getvalue() == "9\n"
+
+@pytest.mark.parametrize("main", ["big(0); 5", "big(0); print(7); 5"])
+def test_parallel_discarded_call_still_raises(main):
+    module = build(f"fun d(x: int): int {{ 1 / x }}\nfun big(x: int): int {{ d(x) + d(x) + d(x) + d(x) }}\nimp main(): int {{ {main} }}")
+
+    expected = io.StringIO()
+    with pytest.raises(Exception, match="Division by zero"):
+        Interpreter(module, expected).run()
+
+    out = io.StringIO()
+    with Interpreter(module, out, parallel=True, workers=2, cost_threshold=5) as interpreter:
+        with pytest.raises(Exception, match="Division by zero"):
+            interpreter.run()
+
+    assert out.getvalue() == expected.getvalue() == ""
+
+def test_parallel_matches_sequential():
+    module = build("fun f(x: int): int { x * x + x * 3 }\nfun g(x: int): int { f(x) + f(x + 1) }\nimp main(): int { g(1); g(2) + g(3) }")
+    expected = Interpreter(module).run()
+
+    with Interpreter(module, parallel=True, workers=2, cost_threshold=5) as interpreter:
+        assert interpreter.run() == expected
+
+def test_max_depth():
+    module = build("fun r(n: int): int { r(n) + 1 }\nimp main(): int { r(1) }")
+
+    with pytest.raises(Exception, match="Call stack exceeded 50 frames in fun r"):
+        Interpreter(module, max_depth=50).run()
+
+def test_run_with_arguments():
+    module = build("fun add(a: int, b: int): int { a + b * 2 }")
+    interpreter = Interpreter(module)
+
+    assert interpreter.run("add", (1, 2)) == 5
+    assert interpreter.stack == []
+
+    with pytest.raises(Exception, match="Could not find function 'main'"):
+        interpreter.run()
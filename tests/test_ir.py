@@ -0,0 +1,29 @@
+import pytest
+from errors import CompileError
+from helpers import build
+from ir import Ret, format_function
+
+def test_statement_after_value_is_rejected():
+    with pytest.raises(CompileError, match="Unexpected statement after expression"):
+        build("fun f(): int { 2 1; }\nimp main(): int { f() + 1 }")
+
+def test_body_returns_its_value():
+    module = build("imp f(): int { print(1); 2 }")
+    body = module.functions["f"].body
+
+    assert type(body[-1]) == Ret
+    assert body[-1].value is not None
+
+def test_lowering():
+    module = build("fun sq(x: int): int { x * x }\nimp main(): int { print(sq(3)); 1 }")
+
+    assert format_function(module.functions["sq"]) == "fun sq(x)\n  %0 = x * x\n  ret %0"
+    assert format_function(module.functions["main"]) == "\n".join([
+        "imp main()",
+        "  %0 = 3",
+        "  %1 = call sq(%0)",
+        "  %2 = call print(%1)",
+        "  %3 = 1",
+        "  ret %3",
+    ])
+    assert module.is_pure_call("sq") and not module.is_pure_call("main") and not module.is_pure_call("print")
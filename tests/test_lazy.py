@@ -0,0 +1,63 @@
+import pytest
+from errors import CompileError
+from helpers import parse
+from plast import AstToken, LazyExpression
+from validation import validate_ast
+
+SOURCE = """fun sq(x: int): int { x * x }
+imp main(): int {
+    print(sq(3));
+    sq(4) + 2 / 1
+}
+"""
+
+# node types, token contents and positions, without the token objects themselves
+def dump(node):
+    if type(node) == LazyExpression:
+        return dump(node.force())
+    if type(node) == AstToken:
+        return (node.token.content, node.token.position)
+    if type(node) == list:
+        return [dump(n) for n in node]
+    if hasattr(node, "_fields"):
+        return (type(node).__name__,) + tuple(dump(v) for v in node)
+
+    return node
+
+def test_bodies_stay_unparsed():
+    ast = parse(SOURCE, True)
+    bodies = [c.body for c in ast.children]
+
+    assert all(type(b) == LazyExpression and not b.parsed for b in bodies)
+    assert [c.name.token.content for c in ast.children] == ["sq", "main"]
+    assert all(not b.parsed for b in bodies)
+
+def test_force_matches_eager_ast():
+    lazy = parse(SOURCE, True)
+    eager = parse(SOURCE, False)
+
+    assert dump(lazy) == dump(eager)
+    assert all(c.body.parsed for c in lazy.children)
+
+def test_validation_forces_bodies():
+    ast = parse(SOURCE, True)
+    validate_ast(ast)
+
+    assert all(c.body.parsed for c in ast.children)
+
+def test_body_error_is_reported_when_forced():
+    source = "fun a(): int { 1 }\nfun b(x: int): int {\n  x + ;\n}"
+
+    with pytest.raises(CompileError) as eager:
+        parse(source, False)
+
+    ast = parse(source, True)
+    assert ast.children[0].body.force()
+
+    with pytest.raises(CompileError) as forced:
+        ast.children[1].body.force()
+
+    assert forced.value.error.message == eager.value.error.message
+    assert forced.value.error.pos == eager.value.error.pos
+    assert forced.value.error.line == eager.value.error.line == "  x + ;"
+    assert forced.value.error.pos.start_row == 3
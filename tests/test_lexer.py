@@ -0,0 +1,44 @@
+import pytest
+from lexer import Lexer, ParallelLexer, TokenType
+
+SOURCE = "\n".join(f"fun f{i}(x: int, y: int): int {{ x * {i} + y - f{i}(x, y) / 2 }}" for i in range(200)) + "\n"
+
+def shape(tokens):
+    return [(t.type, t.content, t.position, t.left and t.left.position, t.right and t.right.position) for t in tokens]
+
+@pytest.mark.parametrize("source", [
+    SOURCE,
+    "fun f(x: int): int { x + y }\n",
+    "fun f(): int { 1 }x",
+    "imp main(): int {\n  print(12);\n  34\n}"
+], ids=["program", "identifier", "trailing", "statements"])
+@pytest.mark.parametrize("min_chunk", [1, 7, 64])
+def test_parallel_matches_sequential(source, min_chunk):
+    expected = Lexer(source, "s").lex()
+    tokens = ParallelLexer(source, "s", workers=8, min_chunk=min_chunk).lex()
+
+    assert shape(tokens) == shape(expected)
+
+def test_parallel_reports_every_error():
+    source = "fun a(): int { 1 }\n" * 20 + "fun é(): int { 1² }\n" + "fun b(): int { 2 }\n" * 20 + "fun c(): int { ~ }"
+    expected = Lexer(source, "s")
+    expected.lex()
+
+    lexer = ParallelLexer(source, "s", workers=8, min_chunk=16)
+    lexer.lex()
+
+    assert len(lexer.errors) == 3
+    assert lexer.line_errors() == expected.line_errors()
+
+def test_identifier_at_end_of_input():
+    tokens = Lexer("fun f(): int { 1 }x", "s").lex()
+
+    assert [t.content for t in tokens[-2:]] == ["x", None]
+    assert tokens[-1].type == TokenType.EOF
+
+@pytest.mark.parametrize("char", ["é", "²"])
+def test_non_ascii_is_reported(char):
+    lexer = Lexer(f"fun {char}(): int {{ 1 }}", "s")
+    lexer.lex()
+
+    assert [e.message for e in lexer.errors] == [f"Unrecognized character: '{char}'"]
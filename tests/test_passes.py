@@ -0,0 +1,89 @@
+import pytest
+from helpers import build
+from interpreter import Interpreter
+from ir import Call, format_function
+from passes import Analysis, AnalysisManager, Pass, PassManager, cse, dce, inline, optimize, recursive_functions, \
+    trapping_functions, unreachable_functions
+
+@pytest.mark.parametrize("source", [
+    "imp main(): int { 1 / 0; 5 }",
+    "fun div(x: int): int { 10 / x }\nimp main(): int { div(0); 5 }",
+    "fun half(x: int): int { x / 2 }\nfun div(x: int): int { half(10 / x) }\nimp main(): int { div(0); 5 }",
+])
+def test_dce_keeps_trapping_code(source):
+    module = optimize(build(source))
+
+    with pytest.raises(Exception, match="Division by zero"):
+        Interpreter(module).run()
+
+def test_dce_keeps_calls_that_do_not_return():
+    module = optimize(build("fun loop(x: int): int { loop(x) }\nfun wrap(x: int): int { loop(x) }\nimp main(): int { wrap(1); 5 }"))
+
+    assert any(i.name == "wrap" or i.name == "loop" for i in module.functions["main"].body if hasattr(i, "name"))
+
+def test_dce_drops_safe_code():
+    module = optimize(build("fun sq(x: int): int { x * x / 2 }\nimp main(): int { sq(3); 8 / 4; 5 }"))
+
+    assert [type(i).__name__ for i in module.functions["main"].body] == ["Const", "Ret"]
+
+def test_cse():
+    module = build("fun f(x: int): int { x * 2 + x * 2 }")
+    PassManager([cse, dce]).run(module)
+
+    assert format_function(module.functions["f"]).splitlines()[1:] == ["  %0 = 2", "  %1 = x * %0", "  %4 = %1 + %1", "  ret %4"]
+
+def test_inline_small_pure_functions():
+    module = build("fun sq(x: int): int { x * x }\nfun f(y: int): int { sq(y) + 1 }")
+    PassManager([inline()]).run(module)
+
+    assert not any(type(i) == Call for i in module.functions["f"].body)
+
+def test_inline_skips_recursive_and_impure_functions():
+    module = build("fun r(x: int): int { r(x) }\nimp p(x: int): int { x }\nimp f(y: int): int { r(y) + p(y) }")
+    PassManager([inline()]).run(module)
+
+    assert [i.name for i in module.functions["f"].body if type(i) == Call] == ["r", "p"]
+
+def test_unreachable_functions():
+    module = build("fun a(): int { 1 }\nfun b(): int { a() }\nfun c(): int { 2 }\nimp main(): int { b() }")
+    PassManager([unreachable_functions()]).run(module)
+
+    assert set(module.functions) == { "main", "b", "a" }
+
+def test_libraries_keep_every_function():
+    module = build("fun a(): int { 1 }\nfun c(): int { 2 }")
+    PassManager([unreachable_functions()]).run(module)
+
+    assert set(module.functions) == { "a", "c" }
+
+def test_analyses_are_cached_until_invalidated():
+    computed = []
+    counting = Analysis("counting", lambda module, analyses: computed.append(1) or len(computed))
+
+    def run(module, analyses) -> bool:
+        analyses.get(counting)
+        analyses.get(counting)
+        return True
+
+    PassManager([Pass("keeps", run, frozenset({ "counting" }))], max_iterations=3).run(build("fun a(): int { 1 }"))
+    assert len(computed) == 1
+
+    computed.clear()
+    PassManager([Pass("drops", run)], max_iterations=3).run(build("fun a(): int { 1 }"))
+    assert len(computed) == 3
+
+def test_analyses_share_their_dependencies():
+    computed = []
+
+    class Counting(AnalysisManager):
+        def get(self, analysis: Analysis):
+            if analysis.name not in self.cache:
+                computed.append(analysis.name)
+
+            return super().get(analysis)
+
+    analyses = Counting(build("fun a(x: int): int { a(x) }\nfun b(): int { a(1) }"))
+
+    assert analyses.get(trapping_functions) == { "a", "b" }
+    assert analyses.get(recursive_functions) == { "a" }
+    assert sorted(computed) == ["call_graph", "recursive_functions", "trapping_functions"]
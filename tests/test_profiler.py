@@ -0,0 +1,83 @@
+import io
+import pytest
+from helpers import build
+from interpreter import Interpreter
+from profiler import Profiler, SamplingProfiler
+
+# there is no branching yet, so recursion ends with a division by zero once n reaches 0
+COUNTDOWN = "n - 1 + 1 / n - 1 / n"
+
+def profile(source: str, raises: bool = False):
+    profiler = Profiler()
+    interpreter = Interpreter(build(source), io.StringIO(), profiler=profiler)
+
+    if raises:
+        with pytest.raises(Exception, match="Division by zero"):
+            interpreter.run()
+    else:
+        interpreter.run()
+
+    return profiler.profile
+
+def test_calls_and_edges():
+    p = profile("fun sq(x: int): int { x * x }\nimp main(): int { print(sq(2)); sq(3) + sq(4) }")
+
+    assert p.functions["main"].calls == 1
+    assert p.functions["sq"].calls == 3
+    assert p.functions["print"].calls == 1
+    assert p.edges == { ("main", "sq"): 3, ("main", "print"): 1 }
+    assert p.functions["main"].inclusive >= p.functions["main"].exclusive
+    assert p.functions["main"].inclusive >= p.functions["sq"].inclusive
+
+def test_recursion():
+    p = profile(f"fun r(n: int): int {{ r({COUNTDOWN}) + 1 }}\nimp main(): int {{ r(5) + 1 }}", raises=True)
+    r = p.functions["r"]
+
+    assert r.calls == 6
+    assert p.edges == { ("main", "r"): 1, ("r", "r"): 5 }
+    # recursive activations only count towards inclusive time once
+    assert r.inclusive <= p.functions["main"].inclusive
+    assert max(len(stack) for stack in p.stacks) == 7
+
+def test_tail_calls_reuse_the_stack_entry():
+    p = profile("fun sq(x: int): int { x * x }\nimp main(): int { sq(3) }")
+    assert p.edges == { ("main", "sq"): 1 }
+    assert set(p.stacks) == { ("main",), ("sq",) }
+
+    p = profile(f"fun t(n: int): int {{ t({COUNTDOWN}) }}\nimp main(): int {{ t(5) + 1 }}", raises=True)
+
+    assert p.functions["t"].calls == 6
+    assert p.edges[("t", "t")] == 5
+    assert all(stack in (("main",), ("main", "t")) for stack in p.stacks)
+
+def test_collapsed_format():
+    p = profile("fun sq(x: int): int { x * x }\nimp main(): int { sq(3) + 1 }")
+    lines = p.collapsed().splitlines()
+
+    assert lines == sorted(lines)
+    for line in lines:
+        stack, value = line.rsplit(" ", 1)
+        assert stack.split(";")[0] == "main"
+        assert int(value) > 0
+
+    assert any(line.startswith("main;sq ") for line in lines)
+
+def test_table():
+    table = profile("fun sq(x: int): int { x * x }\nimp main(): int { print(sq(3)); 1 }").table().splitlines()
+
+    assert table[0].split()[:3] == ["function", "location", "calls"]
+    assert any(line.split()[:3] == ["print", "builtin", "1"] for line in table)
+    assert any(line.split()[:3] == ["sq", "1:5", "1"] for line in table)
+
+def test_sampling_profiler():
+    interpreter = Interpreter(build(f"fun t(n: int): int {{ t({COUNTDOWN}) }}\nimp main(): int {{ t(300000) + 1 }}"))
+
+    with SamplingProfiler(interpreter, interval=0.0005) as sampler:
+        with pytest.raises(Exception, match="Division by zero"):
+            interpreter.run()
+
+    p = sampler.profile
+    assert p.unit == "samples"
+    assert sum(p.stacks.values()) > 0
+    assert set(p.functions) <= { "main", "t" }
+    assert all(stack[0] == "main" for stack in p.stacks)
@@ -0,0 +1,37 @@
+import io
+from session import Session
+
+def test_redefining_a_body_only_rechecks_that_function():
+    session = Session(io.StringIO())
+    session.submit("\nfun a(x: int): int { x * x }")
+    session.submit("\nfun b(): int { a(3) }")
+
+    result = session.submit("\nfun a(x: int): int { x + x }")
+
+    assert result.defined == ["a"]
+    assert session.state.rechecked == { "a" }
+    assert session.run("b") == 6
+
+def test_changed_signature_rechecks_callers():
+    session = Session(io.StringIO())
+    session.submit("\nfun a(x: int): int { x * x }")
+    session.submit("\nfun b(): int { a(3) }")
+
+    result = session.submit("\nfun a(x: int, y: int): int { x + y }")
+
+    assert result.diagnostics[0].message == "fun a expects 2 arguments, got 1"
+    assert result.diagnostics[0].file == "input2"
+    assert session.run("b") == 9
+
+def test_rejected_input_leaves_no_errors_behind():
+    session = Session(io.StringIO())
+    session.submit("\nfun a(x: int): int { x * x }")
+    session.submit("\nfun b(): int { a(3) }")
+
+    result = session.submit("\nimp a(x: int): int { x }")
+    assert result.diagnostics[0].message == "Can't invoke impure function 'a' from pure context"
+    assert session.state.errors == {}
+
+    result = session.submit("\nfun a(x: int): int { x + 100 }")
+    assert result.defined == ["a"]
+    assert session.run("b") == 103
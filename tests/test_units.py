@@ -0,0 +1,63 @@
+import pickle
+import pytest
+from errors import CompileError
+from interpreter import Interpreter
+from units import compile_file, compile_unit, link, read_interface, read_object, write_interface
+
+LIBRARY = "fun sq(x: int): int { x * x }"
+APP = "imp main(): int { print(sq(4)); sq(5) }"
+
+def test_link_accepts_same_signature_from_renamed_unit():
+    lib = compile_unit(LIBRARY, "lib")
+    app = compile_unit("imp main(): int { sq(4) }", "app", (lib.interface,))
+
+    module = link([app, compile_unit(LIBRARY, "mathlib")], optimized=False)
+
+    assert set(module.functions) == { "main", "sq" }
+
+def test_dependents_only_need_the_interface():
+    lib = compile_unit(LIBRARY, "lib")
+    app = compile_unit(APP, "app", (lib.interface,))
+
+    assert set(app.imports) == { "sq" }
+    assert set(app.module.functions) == { "main" }
+    assert Interpreter(link([app, lib])).run() == 25
+
+def test_link_errors():
+    lib = compile_unit(LIBRARY, "lib")
+    app = compile_unit(APP, "app", (lib.interface,))
+
+    with pytest.raises(CompileError, match="Unresolved fun sq imported by app"):
+        link([app])
+
+    with pytest.raises(CompileError, match="app was compiled against a different signature of fun sq from lib"):
+        link([app, compile_unit("imp sq(x: int): int { x }", "lib")])
+
+    with pytest.raises(CompileError, match="fun sq is defined in both lib and copy"):
+        link([app, lib, compile_unit(LIBRARY, "copy")])
+
+def test_files_round_trip(tmp_path):
+    (tmp_path / "lib.pl").write_text(LIBRARY)
+    (tmp_path / "app.pl").write_text(APP)
+
+    lib = compile_file(tmp_path / "lib.pl")
+    app = compile_file(tmp_path / "app.pl", (tmp_path / "lib.pli",))
+
+    assert read_interface(tmp_path / "lib.pli") == lib.interface
+    assert read_object(tmp_path / "app.plo") == app
+    assert Interpreter(link([read_object(tmp_path / "app.plo"), read_object(tmp_path / "lib.plo")])).run() == 25
+
+def test_untrusted_artifacts_are_rejected(tmp_path):
+    lib = compile_unit(LIBRARY, "lib")
+    write_interface(lib.interface, tmp_path / "lib.pli")
+
+    with pytest.raises(CompileError, match="is not a valid object file"):
+        read_object(tmp_path / "lib.pli")
+
+    (tmp_path / "evil.pli").write_bytes(pickle.dumps(lib.interface))
+    with pytest.raises(CompileError, match="is not a valid interface file"):
+        read_interface(tmp_path / "evil.pli")
+
+    (tmp_path / "broken.plo").write_text('{"format": 2, "kind": "object", "interface": {}}')
+    with pytest.raises(CompileError):
+        read_object(tmp_path / "broken.plo")
@@ -0,0 +1,124 @@
+import pytest
+from errors import CompileError
+from helpers import parse
+from plast import HashConsTable
+from validation import validate_ast, validate_incremental
+from xref import XrefIndex
+
+def test_duplicate_error_is_cleared():
+    a = "fun a(): int { 1 }\n"
+    c = "fun c(): int { a() }\n"
+
+    state = validate_incremental(parse(a + c + c))
+    assert state.errors["c"].message == "fun c is already declared in scope"
+
+    validate_incremental(parse(a + c), state)
+    assert state.errors == {}
+
+def test_duplicate_keeps_own_error():
+    c = "fun c(): int { b() }\n"
+
+    state = validate_incremental(parse(c + c))
+    validate_incremental(parse(c), state)
+
+    assert state.errors["c"].message == "Could not find function 'b'"
+
+def test_moved_functions_keep_their_references():
+    functions = ["fun f0(x: int): int { x }"] + [f"fun f{i}(x: int): int {{ f0(x) }}" for i in range(1, 50)]
+    state = validate_incremental(parse("\n".join(functions)))
+
+    functions[0] = "fun f0(x: int): int { x + 1 + 2 }"
+    source = "\n".join(functions)
+    validate_incremental(parse(source), state)
+
+    references = state.index.find_references("f0")
+    assert state.rechecked == { "f0" }
+    assert len(references) == 49
+    assert all(source[r.position.index : r.position.index + 2] == "f0" for r in references)
+    assert state.index.symbol_at(references[0].position.index) == "f0"
+
+def check(source: str, hash_cons: bool):
+    table = HashConsTable() if hash_cons else None
+    ast = parse(source, table=table)
+
+    with pytest.raises(CompileError) as e:
+        validate_ast(ast, memoize=hash_cons, table=table)
+
+    return e.value.error
+
+@pytest.mark.parametrize("source", [
+    "imp p(): int { 1 }\nimp a(): int { p() }\nfun b(): int { p() }",
+    "imp a(): int { print(1); 2 }\nimp b(): int { 1 + 2 + print(3) }",
+    "imp a(): int { 2 + 3 }\nimp b(): int { print(1) + 2 + 3 }",
+    "fun b(): int { y + y }",
+    "imp g(): int { 1 }\nfun b(): int { g() + g() }",
+    "imp g(): int { 1 }\nfun b(): int { 1 + g() + 2 + g() }",
+    "fun b(x: void): int { x + x }",
+    "fun a(x: int): int { x }\nfun b(x: void): int { a(1) + x + x * 2 }",
+])
+def test_hash_consed_errors_point_at_the_failing_function(source):
+    plain = check(source, False)
+    shared = check(source, True)
+
+    assert shared.message == plain.message
+    assert shared.pos == plain.pos
+    assert shared.line == plain.line and " b(" in shared.line
+
+def test_failing_purity_check_is_rechecked():
+    b = "fun b(): int { a() }\n"
+
+    state = validate_incremental(parse("fun a(): int { 1 }\n" + b))
+    validate_incremental(parse("imp a(): int { 1 }\n" + b), state)
+    assert state.errors["b"].message == "Can't invoke impure function 'a' from pure context"
+
+    validate_incremental(parse("fun a(): int { 2 }\n" + b), state)
+    assert state.errors == {}
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_operator_edit_is_rechecked(lazy):
+    g = "fun g(x: int): int { x }\n"
+    state = validate_incremental(parse(g + "fun f(x: int): int { x * g(x) }", lazy))
+
+    source = g + "fun f(x: int): int { x    + g(x) }"
+    validate_incremental(parse(source, lazy), state)
+
+    assert state.rechecked == { "f" }
+    assert state.index.symbol_at(source.rindex("g(")) == "g"
+
+def test_moved_functions_match_a_fresh_index():
+    body = "fun a(x: int): int { x }\nfun b(y: int): int { a(y) + a(2) }"
+    state = validate_incremental(parse(body))
+
+    for source in ("\n\n" + body, "fun t(): int { 1 } fun u(): int { 2 }\n\n" + body, "fun t(): int { 1 }   " + body):
+        validate_incremental(parse(source), state)
+        fresh = XrefIndex()
+        validate_ast(parse(source), fresh)
+
+        for name in ("a", "b", "a.x", "b.y"):
+            assert state.index.definition(name) == fresh.definition(name)
+            assert sorted(state.index.find_references(name)) == sorted(fresh.find_references(name))
+
+        call = source.index("a(y)")
+        assert state.index.symbol_at(call) == fresh.symbol_at(call) == "a"
+
+def test_moved_error_reports_new_position():
+    b = "fun b(): int { g() }"
+    state = validate_incremental(parse("fun a(): int { 1 }\n" + b))
+    assert state.errors["b"].error.pos.start_row == 2
+
+    validate_incremental(parse("fun a(): int { 1 }\n\n\n" + b), state)
+    assert state.errors["b"].error.pos.start_row == 4
+
+def test_index_of_hash_consed_ast():
+    source = "fun f(x: int): int { x * 2 + x * 2 + g(x) + g(x) }\nfun g(x: int): int { x }"
+    table = HashConsTable()
+    ast = parse(source, table=table)
+
+    index = XrefIndex()
+    validate_ast(ast, index, table=table)
+
+    def offsets(name: str):
+        return sorted(r.position.index for r in index.find_references(name))
+
+    assert offsets("f.x") == [i for i in range(source.index("{"), source.index("\n")) if source[i] == "x"]
+    assert offsets("g") == [i for i in range(source.index("\n")) if source.startswith("g(", i)]
@@ -0,0 +1,59 @@
+import pytest
+from helpers import parse
+from interpreter import Interpreter
+from validation import validate_ast
+from ir import lower_program
+from vectorize import vectorize
+
+np = pytest.importorskip("numpy")
+
+SOURCE = """fun sq(x: int): int { x * x }
+fun poly(a: int, b: int): int { sq(a) + 3 * a * b - b / 2 + 7 }
+fun k(): int { 5 }
+fun half(x: int): int { 10 / x }
+fun r(x: int): int { r(x) }
+fun v(x: int): void { x; }
+imp p(x: int): int { print(x); x }
+"""
+
+@pytest.fixture(scope="module")
+def program():
+    ast = parse(SOURCE)
+    validate_ast(ast)
+    return ast
+
+def decl(program, name: str):
+    return next(c for c in program.children if c.name.token.content == name)
+
+def test_kernel_matches_interpreter(program):
+    a = np.arange(-20, 20)
+    b = np.arange(40, 0, -1) - 13
+
+    kernel = vectorize(decl(program, "poly"), program)
+    interpreter = Interpreter(lower_program(program))
+
+    assert list(kernel(a, b)) == [interpreter.run("poly", (int(x), int(y))) for x, y in zip(a, b)]
+
+def test_kernel_broadcasts(program):
+    assert list(vectorize(decl(program, "poly"), program)(np.arange(3), 2)) == [6, 13, 22]
+    assert int(vectorize(decl(program, "k"), program)()) == 5
+
+def test_division_by_zero(program):
+    kernel = vectorize(decl(program, "half"), program)
+
+    assert list(kernel(np.array([1, 3, -4]))) == [10, 3, -3]
+    with pytest.raises(Exception, match="Division by zero in fun half"):
+        kernel(np.array([1, 0]))
+
+def test_argument_count(program):
+    with pytest.raises(Exception, match="fun sq expects 1 arguments, got 2"):
+        vectorize(decl(program, "sq"), program)(1, 2)
+
+@pytest.mark.parametrize("name, message", [
+    ("p", "Cannot vectorize impure fun p"),
+    ("r", "Cannot vectorize recursive fun r"),
+    ("v", "Cannot vectorize fun v: only int parameters and results are supported"),
+])
+def test_rejected(program, name, message):
+    with pytest.raises(Exception, match=message):
+        vectorize(decl(program, name), program)
@@ -0,0 +1,79 @@
+import pytest
+from helpers import parse
+from plast import AstTransformer, IntegerLiteral
+from visitor import Visitor, visits
+
+class Counter(Visitor):
+    def __init__(self):
+        self.seen = []
+
+    @visits(int)
+    def visit_int(self, node: int):
+        self.seen.append(node)
+        return node
+
+    @visits(list)
+    def visit_list(self, node: list):
+        return sum(r for r in map(self.visit, node) if r is not None)
+
+def test_dispatch():
+    assert Counter().run([1, [2, 3]]) == 6
+
+def test_hooks():
+    class Skipping(Counter):
+        def pre_visit(self, node) -> bool:
+            return node != 2
+
+        def post_visit(self, node, result):
+            return result + 1 if type(node) == int else result
+
+    assert Skipping().run([1, [2, 3]]) == 6
+
+def test_stop_ends_the_traversal():
+    class Finder(Counter):
+        def visit_int(self, node: int):
+            if node > 1:
+                self.stop(node)
+
+            return super().visit_int(node)
+
+    finder = Finder()
+    assert finder.run([1, [2, 3], 4]) == 2
+    assert finder.seen == [1]
+    assert finder.run([1]) == 1
+
+def test_own_visit_is_kept():
+    class Logging(Counter):
+        def visit(self, node, *args):
+            self.seen.append("visit")
+            return super().visit(node, *args)
+
+    class Child(Logging):
+        pass
+
+    for cls in (Logging, Child):
+        visitor = cls()
+        assert visitor.run([1, 2]) == 3
+        assert visitor.seen == ["visit", "visit", 1, "visit", 2]
+
+class Doubler(AstTransformer):
+    @visits(IntegerLiteral)
+    def visit_integer(self, node: IntegerLiteral):
+        return node._replace(value=str(int(node.value) * 2))
+
+def test_transformer_copies_only_changed_nodes():
+    ast = parse("fun f(x: int): int { x + 2 }\nfun g(x: int): int { x }")
+    new = Doubler().run(ast)
+
+    f, g = new.children
+    assert new is not ast and f is not ast.children[0]
+    assert g is ast.children[1]
+    assert f.name is ast.children[0].name
+    assert f.body.children[0].right.value == "4"
+    assert ast.children[0].body.children[0].right.value == "2"
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_transformer_returns_unchanged_tree(lazy):
+    ast = parse("fun g(x: int): int { x }", lazy)
+    assert Doubler().run(ast) is ast
+    assert AstTransformer().run(ast) is ast
@@ -0,0 +1,67 @@
+from helpers import parse
+from validation import validate_ast
+from xref import XrefIndex
+
+SOURCE = """fun sq(x: int): int { x * x }
+fun add(a: int, b: int): int { sq(a) + b }
+imp main(): int { print(add(sq(2), 3)); sq(1) }
+"""
+
+def index() -> XrefIndex:
+    ast = parse(SOURCE)
+    index = XrefIndex()
+    validate_ast(ast, index)
+    return index
+
+def offsets(text: str) -> list[int]:
+    out = []
+    i = SOURCE.find(text)
+    while i != -1:
+        out.append(i)
+        i = SOURCE.find(text, i + 1)
+
+    return out
+
+def test_definitions():
+    idx = index()
+
+    assert idx.definition("sq").kind == "function"
+    assert idx.definition("sq").position.index == SOURCE.index("sq")
+    assert idx.definition("add.b").kind == "parameter"
+    assert idx.definition("add.b").function == "add"
+    assert idx.definition("missing") is None
+
+def test_references():
+    idx = index()
+
+    assert sorted(r.position.index for r in idx.find_references("sq")) == offsets("sq(")[1:]
+    assert [r.function for r in idx.find_references("add")] == ["main"]
+    assert len(idx.find_references("sq.x")) == 2
+    assert idx.find_references("missing") == []
+
+def test_call_hierarchy():
+    idx = index()
+
+    assert idx.callees_of("main") == { "print", "add", "sq" }
+    assert idx.callees_of("add") == { "sq" }
+    assert idx.callees_of("sq") == set()
+    assert idx.callers_of("sq") == { "add", "main" }
+
+def test_definition_at():
+    idx = index()
+    call = SOURCE.index("add(sq(2)")
+
+    assert idx.symbol_at(call) == "add"
+    assert idx.symbol_at(call + 2) == "add"
+    assert idx.definition_at(call).position.index == SOURCE.index("add")
+    assert idx.definition_at(SOURCE.index("b }")).name == "add.b"
+    assert idx.definition_at(SOURCE.index("{")) is None
+
+def test_remove_function():
+    idx = index()
+    idx.remove_function("main")
+
+    assert idx.callers_of("sq") == { "add" }
+    assert [r.function for r in idx.find_references("sq")] == ["add"]
+    assert idx.find_references("add") == []
+    assert idx.symbol_at(SOURCE.index("add(sq(2)")) is None